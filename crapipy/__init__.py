@@ -3,8 +3,27 @@ Clash Royale wrapper for cr-api.com
 """
 __version__ = "1.7"
 
+import logging
+
+# All modules log to children of the package logger. Only errors are shown
+# by default, warnings such as retries need a handler of the application.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+_handler = logging.StreamHandler()
+_handler.setLevel(logging.ERROR)
+_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(_handler)
+
 from .client import Client
 from .client_async import AsyncClient
-from .exceptions import APITimeoutError, APIClientResponseError, APIError
+from .exceptions import APITimeoutError, APIClientResponseError, APIConnectionError, APIError
 from .url import APIURL
-from .models import Clan, Player, Clans, Players, Tag, Tournament, EndPoints, Tournaments
\ No newline at end of file
+from .models import Clan, Player, Clans, Players, Tag, Tournament, EndPoints, Tournaments
+from .bulk import BulkResult
+from .cache import MemoryCache, SQLiteCache
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .columns import ClanTable, PlayerTable
+from .crawler import Crawler
+from .watch import Watcher
+from .pipeline import Middleware, MetricsMiddleware
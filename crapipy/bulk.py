@@ -0,0 +1,177 @@
+"""
+Helpers for bulk requests.
+"""
+import asyncio
+import copy
+from collections import OrderedDict
+
+from .exceptions import APIClientResponseError, APIError
+from .models import Tag
+
+MAX_TAGS_PER_REQUEST = 25
+
+
+def chunked(items, size):
+    """Split a list into lists of at most size items."""
+    if size < 1:
+        raise ValueError("Chunk size must be at least 1.")
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def unique_tags(tags):
+    """Normalize tags and drop duplicates, keeping input order."""
+    seen = set()
+    ptags = []
+    for tag in tags:
+        ptag = Tag.normalize(tag)
+        if ptag not in seen:
+            seen.add(ptag)
+            ptags.append(ptag)
+    return ptags
+
+
+def should_split(error):
+    """Return True if a chunk which failed with error should be fetched again tag by tag.
+
+    Only client errors such as 400 or 404, which one bad tag can cause, are
+    split. Rate limiting, server errors, timeouts and connection errors
+    would fail each single-tag request too, so they fail the whole chunk.
+    """
+    if not isinstance(error, APIClientResponseError):
+        return False
+    try:
+        status = int(error.status)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= status < 500 and status != 429
+
+
+def chunk_error(tags, error):
+    """Return dict assigning error to each tag of a chunk."""
+    return {tag: error for tag in tags}
+
+
+def map_chunk(tags, data, model):
+    """Map a multi-tag response back to the requested tags.
+
+    :param tags: Normalized tags which were requested.
+    :param data: Decoded response, a list of items or a single item.
+    :param model: Model class used to wrap each item.
+    :return: dict of tag to model instance or APIError.
+    """
+    if isinstance(data, dict):
+        data = [data]
+    results = {}
+    for d in data:
+        results[Tag.normalize(d.get('tag', ''))] = model(d)
+    for tag in tags:
+        if tag not in results:
+            results[tag] = APIError(error=True, message="Tag {} missing from response".format(tag))
+    return results
+
+
+class BulkResult:
+    """Result of a single tag in a bulk request."""
+
+    __slots__ = ('tag', 'result', 'error')
+
+    def __init__(self, tag, result=None, error=None):
+        self.tag = tag
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """Return True if the tag was fetched successfully."""
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<BulkResult {} ok>".format(self.tag)
+        return "<BulkResult {} error={!r}>".format(self.tag, self.error)
+
+
+def bulk_results(tags, results):
+    """Build BulkResult list in input order from a dict of tag to result."""
+    out = []
+    for tag in tags:
+        ptag = Tag.normalize(tag)
+        value = results[ptag]
+        if isinstance(value, Exception):
+            out.append(BulkResult(ptag, error=value))
+        else:
+            out.append(BulkResult(ptag, result=value))
+    return out
+
+
+class TagBatcher:
+    """Merge single-tag lookups into multi-tag requests.
+
+    Tags requested within ``window`` seconds of each other, up to
+    ``max_tags`` of them, are sent together as one request and each result
+    is routed back to the caller which asked for it.
+    """
+
+    def __init__(self, fetch_chunk, window=0.01, max_tags=MAX_TAGS_PER_REQUEST):
+        """Init.
+
+        :param fetch_chunk: Coroutine function taking a list of tags and
+                            returning a dict of tag to model or exception.
+        :param window: Seconds to wait for more tags before sending a request.
+        :param max_tags: Max tags per request. Reaching it sends the request at once.
+        """
+        self._fetch_chunk = fetch_chunk
+        self.window = window
+        self.max_tags = max_tags
+        self._pending = OrderedDict()
+        self._handle = None
+        # Requests in flight. The event loop only keeps weak references to
+        # tasks, so they are kept here until done.
+        self._tasks = set()
+
+    async def get(self, tag):
+        """Return the result for a single normalized tag."""
+        future = asyncio.get_event_loop().create_future()
+        self._pending.setdefault(tag, []).append(future)
+        if len(self._pending) >= self.max_tags:
+            self.flush()
+        elif self._handle is None:
+            self._handle = asyncio.get_event_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """Send all pending tags now."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        pending, self._pending = self._pending, OrderedDict()
+        if pending:
+            task = asyncio.ensure_future(self._dispatch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Send pending tags and wait for the requests in flight."""
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def _dispatch(self, pending):
+        try:
+            results = await self._fetch_chunk(list(pending))
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for tag, futures in pending.items():
+            value = results[tag]
+            for i, future in enumerate(futures):
+                if future.done():
+                    continue
+                if isinstance(value, Exception):
+                    future.set_exception(value)
+                else:
+                    # Each caller gets its own copy of a shared model.
+                    future.set_result(value if i == 0 else copy.copy(value))
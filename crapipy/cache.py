@@ -0,0 +1,352 @@
+"""
+Response caches.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .url import APIURL
+
+# Default time to live in seconds for each APIURL endpoint.
+DEFAULT_TTL = {
+    'clan': 60,
+    'player': 30,
+    'constants': 6 * 60 * 60,
+    'top_players': 10 * 60,
+    'top_clans': 10 * 60,
+    'tournaments': 60,
+    'endpoints': 6 * 60 * 60,
+    'version': 60 * 60,
+    'popular_players': 10 * 60,
+    'popular_clans': 10 * 60,
+    'popular_tournaments': 10 * 60,
+}
+
+# Time to live in seconds of stored ETag / Last-Modified validators.
+VALIDATOR_TTL = 24 * 60 * 60
+
+
+def cache_key(url, is_json=True):
+    """Return cache key for a request."""
+    if is_json:
+        return url
+    return url + '#text'
+
+
+def validator_key(url, is_json=True):
+    """Return cache key for the validators of a request."""
+    return 'validators:' + cache_key(url, is_json)
+
+
+def conditional_headers(entry):
+    """Return request headers revalidating a stored validator entry."""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def validator_entry(headers, data):
+    """Return validator entry for a response, or None if it has no validators.
+
+    :param headers: Response headers.
+    :param data: Decoded response returned again when the server answers 304.
+    """
+    etag = headers.get('ETag')
+    last_modified = headers.get('Last-Modified')
+    if etag is None and last_modified is None:
+        return None
+    return dict(etag=etag, last_modified=last_modified, data=data)
+
+
+def ttl_for(url, ttl=None):
+    """Return time to live for url.
+
+    :param url: Request URL.
+    :param ttl: Optional dict of endpoint name to TTL overriding DEFAULT_TTL.
+    :return: TTL in seconds, or 0 if responses should not be cached.
+    """
+    name = APIURL.endpoint_name(url)
+    if ttl and name in ttl:
+        return ttl[name]
+    return DEFAULT_TTL.get(name, 0)
+
+
+def json_size(value):
+    """Approximate size in bytes of a decoded JSON value."""
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value))
+
+
+class BaseCache:
+    """Cache interface.
+
+    Caches store decoded responses by key. ``get`` returns None on a miss.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_response(self, url, is_json=True):
+        """Return cached response for a request, or None."""
+        return self.get(cache_key(url, is_json))
+
+    def set_response(self, url, data, is_json=True, ttl=None):
+        """Cache response for a request if its endpoint is cacheable.
+
+        :param ttl: Optional dict of endpoint name to TTL overriding DEFAULT_TTL.
+        """
+        seconds = ttl_for(url, ttl)
+        if seconds > 0:
+            self.set(cache_key(url, is_json), data, seconds)
+
+    def invalidate(self, url=None):
+        """Drop cached responses for url, or everything if url is None."""
+        if url is None:
+            self.clear()
+        else:
+            self.delete(cache_key(url, True))
+            self.delete(cache_key(url, False))
+
+    def stats(self):
+        """Return hit and miss counters."""
+        return dict(hits=self.hits, misses=self.misses)
+
+
+class MemoryCache(BaseCache):
+    """In-memory LRU cache with per-entry expiry.
+
+    Entries are evicted least recently used first once there are more than
+    ``max_entries`` of them or, if ``max_bytes`` is set, once their total
+    size goes over ``max_bytes``. The cache is thread-safe.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, sizeof=json_size):
+        """Init.
+
+        :param max_entries: Max number of entries.
+        :param max_bytes: Optional max total size of entries in bytes.
+        :param sizeof: Function returning the size of a value. Only used with max_bytes.
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while self._entries and (
+                    len(self._entries) > self.max_entries or
+                    (self.max_bytes is not None and self.size > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry[2]
+
+
+class SQLiteCache(BaseCache):
+    """Cache stored in a local SQLite database.
+
+    The database runs in WAL mode so that several processes on one host
+    can read and write the same cache file concurrently. Values are stored
+    as JSON. Expired entries are dropped on access and every
+    ``purge_interval`` writes; once the cache holds more than
+    ``max_entries`` entries or ``max_bytes`` bytes the oldest entries are
+    evicted first. The number and size of entries are kept up to date by
+    triggers in a one-row table, so writes do not scan the cache to check
+    the limits. Hit and miss counters are per process.
+    """
+
+    def __init__(self, path, max_entries=100000, max_bytes=None, timeout=5.0, mmap_size=64 * 1024 * 1024,
+                 purge_interval=100):
+        """Init.
+
+        :param path: Path of the database file.
+        :param max_entries: Max number of entries.
+        :param max_bytes: Optional max total size of entries in bytes.
+        :param timeout: Seconds to wait for a lock held by another process.
+        :param mmap_size: Bytes of the database file to memory-map for reads. 0 to disable.
+        :param purge_interval: Number of writes of this instance between two purges of expired entries.
+        """
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.purge_interval = purge_interval
+        self._writes = 0
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires REAL NOT NULL, stored REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            # Databases created without the table start from the current content.
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_size SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN "
+                "UPDATE cache_size SET entries = entries + 1, bytes = bytes + new.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN "
+                "UPDATE cache_size SET entries = entries - 1, bytes = bytes - old.size; END"
+            )
+
+    def _connect(self):
+        """Return the connection of the current thread and process."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size={:d}".format(self.mmap_size))
+            # Fire the delete trigger on rows replaced by INSERT OR REPLACE.
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _size(conn):
+        """Return number of entries and their total size in bytes."""
+        return conn.execute("SELECT entries, bytes FROM cache_size").fetchone()
+
+    def __len__(self):
+        return self._size(self._connect())[0]
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[1] < time.time():
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires < ?", (key, time.time()))
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        text = json.dumps(value)
+        now = time.time()
+        conn = self._connect()
+        self._writes += 1
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, stored, size) VALUES (?, ?, ?, ?, ?)",
+                (key, text, now + ttl, now, len(text))
+            )
+            if self._writes % self.purge_interval == 0 or self._over_limits(conn):
+                self._evict(conn, now)
+
+    def _over_limits(self, conn):
+        count, size = self._size(conn)
+        return count > self.max_entries or (self.max_bytes is not None and size > self.max_bytes)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then oldest entries while over the limits."""
+        conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+        count, size = self._size(conn)
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            count, size = self._size(conn)
+        if self.max_bytes is None:
+            return
+        while size > self.max_bytes:
+            # Oldest entries covering the overflow, assuming entries of the average size.
+            limit = max(1, (size - self.max_bytes) * count // size)
+            keys = []
+            overflow = size - self.max_bytes
+            for key, entry_size in conn.execute("SELECT key, size FROM cache ORDER BY stored LIMIT ?", (limit,)):
+                if overflow <= 0:
+                    break
+                keys.append((key,))
+                overflow -= entry_size
+            conn.executemany("DELETE FROM cache WHERE key = ?", keys)
+            count, size = self._size(conn)
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache")
+
+    def close(self):
+        """Close the connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
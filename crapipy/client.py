@@ -1,33 +1,116 @@
 """
 cr-api client for Clash Royale.
 """
-import json
-import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
-from requests.exceptions import HTTPError
+from requests.exceptions import RequestException
 
-from .exceptions import APIError
-from .models import Clan, Clans, Player, Constants, Tag, Players, Tournament, EndPoints, Tournaments
+from . import compact, lazy, models
+from .bulk import (MAX_TAGS_PER_REQUEST, bulk_results, chunk_error, chunked, map_chunk, should_split,
+                   unique_tags)
+from .cache import VALIDATOR_TTL
+from .columns import ClanTable, PlayerTable, TournamentTable
+from .exceptions import APIConnectionError, APIError
+from .models import Constants, Tag, EndPoints
+from .pipeline import (CacheMiddleware, Pipeline, RateLimitMiddleware, Request, RequestsTransport,
+                       RetryMiddleware, ValidatorMiddleware)
+from .retry import RetryPolicy
+from .stream import STREAM_CHUNK_SIZE, JSONArrayParser
 from .url import APIURL
+from .util import error_kwargs, get_decoder
 
-logger = logging.getLogger('__name__')
-logger.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.ERROR)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-logger.addHandler(ch)
+class RawModels:
+    """Model type returning decoded JSON as is."""
 
+    @staticmethod
+    def _raw(data):
+        return data
 
-class Client:
-    """
-    API Client.
+    Clan = Clans = Player = Players = Tournament = Tournaments = _raw
+
+
+class ColumnModels(RawModels):
+    """Model type returning lists as columnar tables and single items as decoded JSON."""
+
+    Players = PlayerTable.from_json
+    Clans = ClanTable.from_json
+    Tournaments = TournamentTable.from_json
+
+
+# Namespaces providing the model classes of each model_type.
+MODEL_TYPES = {
+    'box': models,
+    'compact': compact,
+    'lazy': lazy,
+    'raw': RawModels,
+    'columns': ColumnModels,
+}
+
+
+class Endpoint:
+    """Request of an API endpoint and the function converting its response."""
+
+    __slots__ = ('url', 'convert', 'is_json')
+
+    def __init__(self, url, convert, is_json=True):
+        self.url = url
+        self.convert = convert
+        self.is_json = is_json
+
+
+def _first(model):
+    """Return function wrapping a response in model, unwrapping single-item lists."""
+    def convert(data):
+        if isinstance(data, list):
+            data = data[0]
+        return model(data)
+    return convert
+
+
+def _each(model):
+    """Return function wrapping each item of a list response in model."""
+    def convert(data):
+        return [model(d) for d in data]
+    return convert
+
+
+class BaseClient:
+    """Endpoints and request pipeline shared by Client and AsyncClient.
+
+    Subclasses send the requests through :attr:`pipeline` with their
+    transport and implement ``fetch`` and ``_call``.
     """
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, transport=None, cache=None, cache_ttl=None,
+                 validators=None, validator_ttl=VALIDATOR_TTL, rate_limiter=None,
+                 retry=RetryPolicy(), timeout=30, model_type='box', decoder=None, middleware=()):
         self._token = token
+        self.transport = transport
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.validators = validators
+        self.validator_ttl = validator_ttl
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.timeout = timeout
+        self.models = MODEL_TYPES[model_type]
+        self.json_loads = get_decoder(decoder)
+        self._constants = None
+
+        middlewares = []
+        if cache is not None:
+            middlewares.append(CacheMiddleware(cache, cache_ttl))
+        if validators is not None:
+            middlewares.append(ValidatorMiddleware(validators, validator_ttl))
+        if rate_limiter is not None:
+            middlewares.append(RateLimitMiddleware(rate_limiter))
+        if retry is not None:
+            middlewares.append(RetryMiddleware(retry))
+        middlewares.extend(middleware)
+        self.pipeline = Pipeline(middlewares, self.json_loads)
 
     @property
     def token(self):
@@ -36,6 +119,151 @@ class Client:
             self._token = os.environ.get('TOKEN')
         return self._token
 
+    @property
+    def revalidated_count(self):
+        """Return number of requests answered with 304 Not Modified."""
+        validators = self.pipeline.find(ValidatorMiddleware)
+        return validators.revalidated if validators is not None else 0
+
+    def invalidate_cache(self, url=None):
+        """Drop cached response for url, or all cached responses if url is None."""
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
+    def _new_request(self, url, is_json=True, stream=False):
+        return Request(url, is_json, {'auth': self.token}, stream)
+
+    def _clan(self, clan_tag):
+        return Endpoint(APIURL.clan.format(Tag.normalize(clan_tag)), _first(self.models.Clan))
+
+    def _clans(self, clan_tags):
+        return Endpoint(APIURL.clan.format(','.join(Tag.normalize_many(clan_tags))), _each(self.models.Clan))
+
+    def _player(self, tag):
+        return Endpoint(APIURL.player.format(Tag.normalize(tag)), _first(self.models.Player))
+
+    def _players(self, tags):
+        return Endpoint(APIURL.player.format(','.join(Tag.normalize_many(tags))), _each(self.models.Player))
+
+    def _tournament(self, tag):
+        return Endpoint(APIURL.tournaments.format(tag), self.models.Tournament)
+
+    def _constants_endpoint(self):
+        return Endpoint(APIURL.constants, self._to_constants)
+
+    def _to_constants(self, data):
+        # Constants are read-only, so the same instance is returned for as
+        # long as fetch returns the same data, e.g. from the cache.
+        if self._constants is None or self._constants[0] is not data:
+            self._constants = (data, Constants(data))
+        return self._constants[1]
+
+    def _top_players(self, location=''):
+        return Endpoint(APIURL.top_players.format(location), self.models.Players)
+
+    def _top_clans(self, location=''):
+        return Endpoint(APIURL.top_clans.format(location), self.models.Clans)
+
+    def _endpoints(self):
+        return Endpoint(APIURL.endpoints, EndPoints)
+
+    def _version(self):
+        return Endpoint(APIURL.version, str, is_json=False)
+
+    def _popular_players(self):
+        return Endpoint(APIURL.popular_players, self.models.Players)
+
+    def _popular_clans(self):
+        return Endpoint(APIURL.popular_clans, self.models.Clans)
+
+    def _popular_tournaments(self):
+        return Endpoint(APIURL.popular_tournaments, self.models.Tournaments)
+
+
+class Client(BaseClient):
+    """
+    API Client.
+    """
+
+    def __init__(self, token=None, session=None, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 cache=None, cache_ttl=None,
+                 validators=None, validator_ttl=VALIDATOR_TTL, rate_limiter=None,
+                 retry=RetryPolicy(), timeout=30, model_type='box',
+                 decoder=None, max_workers=4, executor=None, transport=None, middleware=()):
+        """Init.
+
+        The client keeps a single requests session so that connections are
+        pooled and kept alive across requests. The session can be shared by
+        multiple threads. Close it with :meth:`close` or use the client as a
+        context manager.
+
+        :param token: API token. Loaded from the TOKEN env var if not set.
+        :param session: Optional requests.Session to use. It is not closed by the client.
+        :param pool_connections: Number of host pools to cache.
+        :param pool_maxsize: Max number of connections kept in each pool.
+        :param pool_block: Block when no free connections are available instead of opening a new one.
+        :param cache: Optional cache instance, e.g. MemoryCache, for decoded responses.
+        :param cache_ttl: Optional dict of APIURL endpoint name to TTL in seconds
+                          overriding crapipy.cache.DEFAULT_TTL. 0 disables caching.
+        :param validators: Optional cache instance storing ETag / Last-Modified validators.
+                           When set, repeat requests are conditional and a 304 response
+                           returns the previously decoded data.
+        :param validator_ttl: Seconds validators and their data are kept.
+        :param rate_limiter: Optional RateLimiter. It can be shared between clients.
+        :param retry: RetryPolicy for timeouts, connection errors and retryable statuses. None to never retry.
+        :param timeout: Request timeout in seconds.
+        :param model_type: Models wrapping responses, 'box' for the Box models in crapipy.models,
+                           'compact' for the __slots__ models in crapipy.compact, 'lazy' for
+                           the models in crapipy.lazy which wrap nested values on access, 'columns'
+                           for the tables of crapipy.columns for lists and decoded JSON otherwise,
+                           or 'raw' for the decoded JSON as is. Raw data may be shared with the cache and
+                           must not be modified.
+        :param decoder: JSON decoder, 'orjson', 'ujson' or 'json'. Defaults to the fastest installed.
+        :param max_workers: Number of threads of the pool used by map_players / map_clans.
+                            Keep it at most pool_maxsize so that every thread reuses a connection.
+        :param executor: Optional concurrent.futures executor to use instead. It is not shut down by the client.
+        :param transport: Optional blocking transport, e.g. a crapipy.pipeline.RequestsTransport
+                          shared with other clients. session and the pool options are then ignored.
+        :param middleware: Additional crapipy.pipeline.Middleware instances, e.g. MetricsMiddleware,
+                           called after the cache, validators, rate limiter and retry policy.
+        """
+        if transport is None:
+            transport = RequestsTransport(session, pool_connections, pool_maxsize, pool_block)
+        super().__init__(token, transport, cache, cache_ttl, validators, validator_ttl, rate_limiter,
+                         retry, timeout, model_type, decoder, middleware)
+        self._executor_lock = threading.Lock()
+        self.max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def session(self):
+        """Return the requests session of the transport."""
+        return self.transport.session
+
+    @property
+    def executor(self):
+        """Return the thread pool of map_players / map_clans, creating it on first use."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                    self._owns_executor = True
+        return self._executor
+
+    def close(self):
+        """Close the underlying session and thread pool if they are owned by the client."""
+        executor, self._executor = self._executor, None
+        if executor is not None and self._owns_executor:
+            executor.shutdown()
+        self.transport.close()
+
     def fetch(self, url, is_json=True):
         """Fetch URL.
 
@@ -43,117 +271,248 @@ class Client:
         :return: Response in JSON
 
         """
-        headers = {'auth': self.token}
-        try:
-            r = requests.get(url, headers=headers)
-            if is_json:
-                data = r.json()
-            else:
-                data = r.text
-
-            if r.status_code != 200:
-                logger.error(
-                    "API Error | HTTP status {status} | url: {url}".format(
-                        status=r.status_code,
-                        url=url
-                    )
-                )
-                raise APIError(**data)
-
-            if isinstance(data, dict):
-                if data.get('error'):
-                    raise APIError(**data)
-
-        except (HTTPError, ConnectionError, json.JSONDecodeError):
-            raise APIError
+        request = Request(url, is_json)
+        data = self.pipeline.lookup(request)
+        if data is not None:
+            return data
 
+        data = self._request_with_retry(url, is_json=is_json)
+        self.pipeline.store(request, data)
         return data
 
+    def _call(self, endpoint):
+        """Fetch an endpoint and convert its response."""
+        return endpoint.convert(self.fetch(endpoint.url, is_json=endpoint.is_json))
+
+    def _request_with_retry(self, url, is_json=True, request=None):
+        """Send a request, retrying transient failures as the pipeline allows.
+
+        :param request: Method sending the request. Defaults to _request.
+        """
+        request = request or self._request
+        attempt = 1
+        while True:
+            try:
+                return request(url, is_json=is_json)
+            except APIError as e:
+                delay = self.pipeline.retry_delay(e.request or Request(url, is_json), e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def _request(self, url, is_json=True):
+        """Send a GET request and decode the response."""
+        return self._send(self._new_request(url, is_json))
+
+    def _open_stream(self, url, is_json=True):
+        """Send a GET request and return the response with its body unread."""
+        return self._send(self._new_request(url, is_json, stream=True))
+
+    def _send(self, request):
+        """Send one attempt of a request through the pipeline.
+
+        :raises APIError: with the request attached, for Middleware.failed.
+        """
+        wait = self.pipeline.prepare(request)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return self.pipeline.response(request, self.transport.send(request, self.timeout))
+        except APIError as e:
+            e.request = request
+            raise
+
+    def stream(self, url, model, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch a JSON array and yield its items one at a time.
+
+        The response is parsed as it is downloaded, so only one item is held
+        in memory at a time. Streamed responses are not cached. Failures are
+        retried only before the first item is yielded.
+
+        :param url: URL
+        :param model: Model class wrapping each item.
+        :param chunk_size: Bytes read at a time.
+        """
+        r = self._request_with_retry(url, request=self._open_stream)
+        parser = JSONArrayParser(self.json_loads)
+        try:
+            try:
+                for chunk in r.iter_content(chunk_size):
+                    for item in parser.feed(chunk):
+                        yield model(item)
+                items = parser.close()
+            except ValueError:
+                raise APIError(status=r.status_code, message="Invalid JSON response")
+            except RequestException as e:
+                raise APIConnectionError(message=str(e))
+        finally:
+            r.close()
+        for item in items:
+            if isinstance(item, dict) and item.get('error'):
+                raise APIError(**error_kwargs(item, r.status_code))
+            yield model(item)
+
+    def stream_players(self, tags, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch multiple players and yield them one at a time as they are downloaded."""
+        return self.stream(self._players(tags).url, self.models.Player, chunk_size)
+
+    def stream_clans(self, clan_tags, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch multiple clans and yield them one at a time as they are downloaded."""
+        return self.stream(self._clans(clan_tags).url, self.models.Clan, chunk_size)
+
     def get_clan(self, clan_tag):
         """Fetch a single clan."""
-        url = APIURL.clan.format(clan_tag)
-        data = self.fetch(url)
-        return Clan(data)
+        return self._call(self._clan(clan_tag))
 
     def get_clans(self, clan_tags):
         """Fetch multiple clans.
 
         :param clan_tags: List of clan tags
         """
-        url = APIURL.clan.format(','.join(clan_tags))
-        data = self.fetch(url)
-        return [Clan(d) for d in data]
+        return self._call(self._clans(clan_tags))
 
     def get_player(self, tag: str):
         """Get player profile by tag.
         :param tag:
         :return:
         """
-        ptag = Tag(tag).tag
-        url = APIURL.player.format(ptag)
-        data = self.fetch(url)
-        return Player(data)
+        return self._call(self._player(tag))
 
     def get_players(self, tags):
         """Fetch multiple players from profile API."""
-        ptags = [Tag(tag).tag for tag in tags]
-        url = APIURL.player.format(','.join(ptags))
-        data = self.fetch(url)
-        return [Player(d) for d in data]
+        return self._call(self._players(tags))
+
+    def _fetch_chunk(self, url, tags, model, cache=True):
+        """Fetch a chunk of tags.
+
+        If the multi-tag request fails with a client error, each tag is
+        fetched on its own so that a single bad tag does not fail the whole
+        chunk. Other errors are returned for every tag.
+
+        :param cache: If False, skip the response cache and always send the request.
+        """
+        chunk_url = url.format(','.join(tags))
+        try:
+            data = self.fetch(chunk_url) if cache else self._request_with_retry(chunk_url)
+        except APIError as e:
+            if len(tags) == 1 or not should_split(e):
+                return chunk_error(tags, e)
+            results = {}
+            for tag in tags:
+                results.update(self._fetch_chunk(url, [tag], model, cache))
+            return results
+        return map_chunk(tags, data, model)
+
+    def _fetch_bulk(self, url, tags, model, chunk_size, max_workers):
+        """Fetch tags in chunks over a thread pool."""
+        # Iterated twice: for the requests and for the results in input order.
+        tags = list(tags)
+        chunks = chunked(unique_tags(tags), chunk_size or MAX_TAGS_PER_REQUEST)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk_results in executor.map(lambda c: self._fetch_chunk(url, c, model), chunks):
+                results.update(chunk_results)
+        return bulk_results(tags, results)
+
+    def _map(self, url, tags, model, chunk_size, ordered):
+        """Fetch tags in chunks over the client's thread pool and yield a BulkResult per tag."""
+        chunks = chunked(unique_tags(tags), chunk_size or MAX_TAGS_PER_REQUEST)
+        submitted = [(self.executor.submit(self._fetch_chunk, url, chunk, model), chunk) for chunk in chunks]
+        futures = dict(submitted)
+        try:
+            for future in ([f for f, _ in submitted] if ordered else as_completed(futures)):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = {tag: e for tag in chunk}
+                for result in bulk_results(chunk, results):
+                    yield result
+        finally:
+            # Stop requests which have not started when the caller stops early.
+            for future in futures:
+                future.cancel()
+
+    def map_players(self, tags, chunk_size=1, ordered=False):
+        """Fetch players in parallel over the client's thread pool.
+
+        :param tags: Iterable of player tags.
+        :param chunk_size: Tags per request. Up to MAX_TAGS_PER_REQUEST tags
+                           can be fetched with one multi-tag request.
+        :param ordered: Yield results in input order instead of as they complete.
+        :return: Generator of BulkResult, one per unique tag. Errors are
+                 returned in BulkResult.error instead of being raised.
+        """
+        return self._map(APIURL.player, tags, self.models.Player, chunk_size, ordered)
+
+    def map_clans(self, clan_tags, chunk_size=1, ordered=False):
+        """Fetch clans in parallel over the client's thread pool.
+
+        :param clan_tags: Iterable of clan tags.
+        :param chunk_size: Tags per request. Up to MAX_TAGS_PER_REQUEST tags
+                           can be fetched with one multi-tag request.
+        :param ordered: Yield results in input order instead of as they complete.
+        :return: Generator of BulkResult, one per unique tag. Errors are
+                 returned in BulkResult.error instead of being raised.
+        """
+        return self._map(APIURL.clan, clan_tags, self.models.Clan, chunk_size, ordered)
+
+    def get_players_bulk(self, tags, chunk_size=None, max_workers=4):
+        """Fetch any number of players in chunked multi-tag requests.
+
+        :param tags: List of player tags
+        :param chunk_size: Max tags per request. Defaults to MAX_TAGS_PER_REQUEST.
+        :param max_workers: Number of chunks fetched concurrently.
+        :return: List of BulkResult in input order.
+        """
+        return self._fetch_bulk(APIURL.player, tags, self.models.Player, chunk_size, max_workers)
+
+    def get_clans_bulk(self, clan_tags, chunk_size=None, max_workers=4):
+        """Fetch any number of clans in chunked multi-tag requests.
+
+        :param clan_tags: List of clan tags
+        :param chunk_size: Max tags per request. Defaults to MAX_TAGS_PER_REQUEST.
+        :param max_workers: Number of chunks fetched concurrently.
+        :return: List of BulkResult in input order.
+        """
+        return self._fetch_bulk(APIURL.clan, clan_tags, self.models.Clan, chunk_size, max_workers)
 
     def get_tournament(self, tag):
         """Get tournament detail."""
-        url = APIURL.tournaments.format(tag)
-        data = self.fetch(url)
-        return Tournament(data)
+        return self._call(self._tournament(tag))
 
     def get_constants(self, key=None):
         """Fetch contants.
 
         :param key: Optional field.
         """
-        url = APIURL.constants
-        data = self.fetch(url)
-        return Constants(data)
+        return self._call(self._constants_endpoint())
 
     def get_top_players(self, location=''):
         """Fetch top players."""
-        url = APIURL.top_players.format(location)
-        data = self.fetch(url)
-        return Players(data)
+        return self._call(self._top_players(location))
 
     def get_top_clans(self, location=''):
         """Fetch top clans."""
-        url = APIURL.top_clans.format(location)
-        data = self.fetch(url)
-        return Clans(data)
+        return self._call(self._top_clans(location))
 
     def get_endpoints(self):
         """Endpoints"""
-        url = APIURL.endpoints
-        data = self.fetch(url)
-        return EndPoints(data)
+        return self._call(self._endpoints())
 
     def get_version(self):
         """API verision."""
-        url = APIURL.version
-        data = self.fetch(url, is_json=False)
-        return data
+        return self._call(self._version())
 
     def get_popular_players(self):
         """Fetch popular players."""
-        url = APIURL.popular_players
-        data = self.fetch(url)
-        return Players(data)
+        return self._call(self._popular_players())
 
     def get_popular_clans(self):
         """Fetch popular clans."""
-        url = APIURL.popular_clans
-        data = self.fetch(url)
-        return Clans(data)
+        return self._call(self._popular_clans())
 
     def get_popular_tournaments(self):
         """Fetch popular tournaments."""
-        url = APIURL.popular_tournaments
-        data = self.fetch(url)
-        return Tournaments(data)
+        return self._call(self._popular_tournaments())
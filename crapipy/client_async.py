@@ -2,156 +2,400 @@
 cr-api async client for Clash Royale.
 """
 import asyncio
-import json
-import logging
-import os
+from collections import deque
 
 import aiohttp
 
-from .exceptions import APIError
-from .models import Clan, Tag, Player, Constants, Players, Clans, Tournament, EndPoints, Tournaments
+from .bulk import (MAX_TAGS_PER_REQUEST, TagBatcher, bulk_results, chunk_error, chunked, map_chunk,
+                   should_split, unique_tags)
+from .cache import VALIDATOR_TTL
+from .client import BaseClient
+from .exceptions import APIConnectionError, APIError, APITimeoutError
+from .models import Tag, Player
+from .pipeline import AiohttpTransport, Request
+from .retry import RetryPolicy
+from .stream import STREAM_CHUNK_SIZE, JSONArrayParser
 from .url import APIURL
+from .util import error_kwargs
 
-logger = logging.getLogger('__name__')
-logger.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.ERROR)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-logger.addHandler(ch)
+class ResponseStream:
+    """Async iterator over the items of a JSON array response.
 
+    The request is sent on the first iteration and the body is parsed as it
+    is downloaded, so only the items of one chunk are held in memory:
 
-class AsyncClient:
+        async for player in client.stream_players(tags):
+            ...
+
+    Leaving the loop early releases the connection when the stream is used
+    as an async context manager or closed with :meth:`close`.
+    """
+
+    def __init__(self, client, url, model, chunk_size=STREAM_CHUNK_SIZE):
+        self._client = client
+        self._url = url
+        self._model = model
+        self._chunk_size = chunk_size
+        self._parser = JSONArrayParser(client.json_loads)
+        self._items = deque()
+        self._response = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._items:
+            if self._parser is None:
+                raise StopAsyncIteration
+            if self._response is None:
+                self._response = await self._client._request_with_retry(
+                    self._url, request=self._client._open_stream
+                )
+            await self._read()
+        return self._model(self._items.popleft())
+
+    async def _read(self):
+        """Read and parse the next chunk of the body."""
+        try:
+            chunk = await self._response.content.read(self._chunk_size)
+            if chunk:
+                self._items.extend(self._parser.feed(chunk))
+                return
+            items = self._parser.close()
+        except ValueError:
+            self.close()
+            raise APIError(status=200, message="Invalid JSON response")
+        except asyncio.TimeoutError as e:
+            self.close()
+            raise APITimeoutError(message=str(e) or "Request timed out")
+        except aiohttp.ClientError as e:
+            self.close()
+            raise APIConnectionError(message=str(e))
+        self.close()
+        for item in items:
+            if isinstance(item, dict) and item.get('error'):
+                raise APIError(**error_kwargs(item, 200))
+        self._items.extend(items)
+
+    def close(self):
+        """Stop the stream and release the connection."""
+        self._parser = None
+        if self._response is not None:
+            self._response.release()
+            self._response = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncClient(BaseClient):
     """
     API AsyncClient.
     """
 
-    def __init__(self, token=None):
-        self._token = token
+    def __init__(self, token=None, session=None, limit=100, limit_per_host=0,
+                 keepalive_timeout=30, ttl_dns_cache=300, coalesce=True,
+                 batch_window=None, batch_size=MAX_TAGS_PER_REQUEST, cache=None, cache_ttl=None,
+                 validators=None, validator_ttl=VALIDATOR_TTL, rate_limiter=None,
+                 retry=RetryPolicy(), timeout=30, model_type='box',
+                 decoder=None, transport=None, middleware=()):
+        """Init.
+
+        The client keeps a single aiohttp session open for its whole lifetime
+        so that connections are pooled and reused across requests. Close it
+        with :meth:`close` or use the client as an async context manager.
+
+        :param token: API token. Loaded from the TOKEN env var if not set.
+        :param session: Optional aiohttp.ClientSession to use. It is not closed by the client.
+        :param limit: Max number of simultaneous connections.
+        :param limit_per_host: Max number of simultaneous connections per host. 0 for no limit.
+        :param keepalive_timeout: Seconds an idle connection is kept alive.
+        :param ttl_dns_cache: Seconds resolved DNS entries are cached.
+        :param coalesce: Share one request between concurrent fetches of the same URL.
+        :param batch_window: If set, get_player and get_clan calls made within this many
+                             seconds of each other are merged into one multi-tag request.
+        :param batch_size: Max tags merged into one request in batching mode.
+        :param cache: Optional cache instance, e.g. MemoryCache, for decoded responses.
+        :param cache_ttl: Optional dict of APIURL endpoint name to TTL in seconds
+                          overriding crapipy.cache.DEFAULT_TTL. 0 disables caching.
+        :param validators: Optional cache instance storing ETag / Last-Modified validators.
+                           When set, repeat requests are conditional and a 304 response
+                           returns the previously decoded data.
+        :param validator_ttl: Seconds validators and their data are kept.
+        :param rate_limiter: Optional RateLimiter. It can be shared between clients.
+        :param retry: RetryPolicy for timeouts, connection errors and retryable statuses. None to never retry.
+        :param timeout: Request timeout in seconds.
+        :param model_type: Models wrapping responses, 'box' for the Box models in crapipy.models,
+                           'compact' for the __slots__ models in crapipy.compact, 'lazy' for
+                           the models in crapipy.lazy which wrap nested values on access, 'columns'
+                           for the tables of crapipy.columns for lists and decoded JSON otherwise,
+                           or 'raw' for the decoded JSON as is. Raw data may be shared with the cache and
+                           must not be modified.
+        :param decoder: JSON decoder, 'orjson', 'ujson' or 'json'. Defaults to the fastest installed.
+        :param transport: Optional asyncio transport, e.g. a crapipy.pipeline.AiohttpTransport
+                          shared with other clients. session and the connector options are then ignored.
+        :param middleware: Additional crapipy.pipeline.Middleware instances, e.g. MetricsMiddleware,
+                           called after the cache, validators, rate limiter and retry policy.
+        """
+        if transport is None:
+            transport = AiohttpTransport(session, limit, limit_per_host, keepalive_timeout, ttl_dns_cache)
+        super().__init__(token, transport, cache, cache_ttl, validators, validator_ttl, rate_limiter,
+                         retry, timeout, model_type, decoder, middleware)
+        self.coalesce = coalesce
+        self._inflight = {}
+        self.coalesced_count = 0
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._batchers = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
     @property
-    def token(self):
-        """Load token from environment if not defined"""
-        if self._token is None:
-            self._token = os.environ.get('TOKEN')
-        return self._token
+    def session(self):
+        """Return the aiohttp session of the transport."""
+        return self.transport.session
+
+    def _batcher(self, url, model):
+        """Return the batcher merging single-tag requests to url."""
+        batcher = self._batchers.get(url)
+        if batcher is None:
+            batcher = TagBatcher(
+                lambda tags: self._fetch_chunk(url, tags, model),
+                window=self.batch_window,
+                max_tags=self.batch_size
+            )
+            self._batchers[url] = batcher
+        return batcher
+
+    async def close(self):
+        """Wait for batched requests and close the underlying session if it is owned by the client."""
+        for batcher in list(self._batchers.values()):
+            await batcher.close()
+        await self.transport.close()
 
     async def fetch(self, url, is_json=True):
         """Fetch URL.
 
+        Concurrent fetches of the same URL await a single shared request
+        unless coalescing is disabled.
+
         :param url: URL
         :return: Response in JSON
         """
-        headers = {'auth': self.token}
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if is_json:
-                        data = await resp.json()
-                    else:
-                        data = await resp.text()
-                    if resp.status != 200:
-                        logger.error(
-                            "API Error | HTTP status {status} | {errmsg} | url: {url}".format(
-                                status=resp.status,
-                                errmsg=data.get('error'),
-                                url=url
-                            )
-                        )
-                        raise APIError(**data)
-
-        except (asyncio.TimeoutError, aiohttp.ClientResponseError, json.JSONDecodeError):
-            raise APIError
+        data = self.pipeline.lookup(Request(url, is_json))
+        if data is not None:
+            return data
 
+        if not self.coalesce:
+            return await self._fetch(url, is_json=is_json)
+
+        key = (url, is_json)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(url, is_json=is_json))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None))
+        else:
+            self.coalesced_count += 1
+        # Shield the shared request so that one cancelled caller does not
+        # cancel it for everyone else waiting on it.
+        return await asyncio.shield(future)
+
+    async def _fetch(self, url, is_json=True):
+        """Request url and store the response in the cache."""
+        data = await self._request_with_retry(url, is_json=is_json)
+        self.pipeline.store(Request(url, is_json), data)
         return data
 
+    async def _call(self, endpoint):
+        """Fetch an endpoint and convert its response."""
+        return endpoint.convert(await self.fetch(endpoint.url, is_json=endpoint.is_json))
+
+    async def _request_with_retry(self, url, is_json=True, request=None):
+        """Send a request, retrying transient failures as the pipeline allows.
+
+        :param request: Coroutine method sending the request. Defaults to _request.
+        """
+        request = request or self._request
+        attempt = 1
+        while True:
+            try:
+                return await request(url, is_json=is_json)
+            except APIError as e:
+                delay = self.pipeline.retry_delay(e.request or Request(url, is_json), e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _request(self, url, is_json=True):
+        """Send a GET request and decode the response."""
+        return await self._send(self._new_request(url, is_json))
+
+    async def _open_stream(self, url, is_json=True):
+        """Send a GET request and return the response with its body unread."""
+        return await self._send(self._new_request(url, is_json, stream=True))
+
+    async def _send(self, request):
+        """Send one attempt of a request through the pipeline.
+
+        :raises APIError: with the request attached, for Middleware.failed.
+        """
+        wait = self.pipeline.prepare(request)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return self.pipeline.response(request, await self.transport.send(request, self.timeout))
+        except APIError as e:
+            e.request = request
+            raise
+
+    def stream(self, url, model, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch a JSON array and iterate over its items as they are downloaded.
+
+        Streamed responses are not cached. Failures are retried only before
+        the first item is returned.
+
+        :param url: URL
+        :param model: Model class wrapping each item.
+        :param chunk_size: Bytes read at a time.
+        :return: ResponseStream to use with async for.
+        """
+        return ResponseStream(self, url, model, chunk_size)
+
+    def stream_players(self, tags, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch multiple players and iterate over them as they are downloaded."""
+        return self.stream(self._players(tags).url, self.models.Player, chunk_size)
+
+    def stream_clans(self, clan_tags, chunk_size=STREAM_CHUNK_SIZE):
+        """Fetch multiple clans and iterate over them as they are downloaded."""
+        return self.stream(self._clans(clan_tags).url, self.models.Clan, chunk_size)
+
     async def get_clan(self, clan_tag):
         """Fetch a single clan."""
-        url = APIURL.clan.format(clan_tag)
-        data = await self.fetch(url)
-        if isinstance(data, list):
-            data = data[0]
-        return Clan(data)
+        if self.batch_window is not None:
+            return await self._batcher(APIURL.clan, self.models.Clan).get(Tag.normalize(clan_tag))
+        return await self._call(self._clan(clan_tag))
 
     async def get_clans(self, clan_tags):
         """Fetch multiple clans.
 
         :param clan_tags: List of clan tags
         """
-        url = APIURL.clan.format(','.join(clan_tags))
-        data = await self.fetch(url)
-        return [Clan(d) for d in data]
+        return await self._call(self._clans(clan_tags))
 
     async def get_player(self, tag: str) -> Player:
         """Get player profile by tag.
         :param tag: 
         :return: 
         """
-        ptag = Tag(tag).tag
-        url = APIURL.player.format(ptag)
-        data = await self.fetch(url)
-        return Player(data)
+        if self.batch_window is not None:
+            return await self._batcher(APIURL.player, self.models.Player).get(Tag.normalize(tag))
+        return await self._call(self._player(tag))
 
     async def get_players(self, tags):
         """Fetch multiple players from profile API."""
-        ptags = [Tag(tag).tag for tag in tags]
-        url = APIURL.player.format(','.join(ptags))
-        data = await self.fetch(url)
-        return [Player(d) for d in data]
+        return await self._call(self._players(tags))
+
+    async def _fetch_chunk(self, url, tags, model, cache=True):
+        """Fetch a chunk of tags.
+
+        If the multi-tag request fails with a client error, each tag is
+        fetched on its own so that a single bad tag does not fail the whole
+        chunk. Other errors are returned for every tag.
+
+        :param cache: If False, skip the response cache and always send the request.
+        """
+        chunk_url = url.format(','.join(tags))
+        try:
+            data = await (self.fetch(chunk_url) if cache else self._request_with_retry(chunk_url))
+        except APIError as e:
+            if len(tags) == 1 or not should_split(e):
+                return chunk_error(tags, e)
+            results = {}
+            for tag in tags:
+                results.update(await self._fetch_chunk(url, [tag], model, cache))
+            return results
+        return map_chunk(tags, data, model)
+
+    async def _fetch_bulk(self, url, tags, model, chunk_size, concurrency):
+        """Fetch tags in chunks with at most concurrency requests in flight."""
+        # Iterated twice: for the requests and for the results in input order.
+        tags = list(tags)
+        chunks = chunked(unique_tags(tags), chunk_size or MAX_TAGS_PER_REQUEST)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_chunk(chunk):
+            async with semaphore:
+                return await self._fetch_chunk(url, chunk, model)
+
+        results = {}
+        for chunk_results in await asyncio.gather(*[fetch_chunk(c) for c in chunks]):
+            results.update(chunk_results)
+        return bulk_results(tags, results)
+
+    async def get_players_bulk(self, tags, chunk_size=None, concurrency=4):
+        """Fetch any number of players in chunked multi-tag requests.
+
+        :param tags: List of player tags
+        :param chunk_size: Max tags per request. Defaults to MAX_TAGS_PER_REQUEST.
+        :param concurrency: Max number of chunks fetched concurrently.
+        :return: List of BulkResult in input order.
+        """
+        return await self._fetch_bulk(APIURL.player, tags, self.models.Player, chunk_size, concurrency)
+
+    async def get_clans_bulk(self, clan_tags, chunk_size=None, concurrency=4):
+        """Fetch any number of clans in chunked multi-tag requests.
+
+        :param clan_tags: List of clan tags
+        :param chunk_size: Max tags per request. Defaults to MAX_TAGS_PER_REQUEST.
+        :param concurrency: Max number of chunks fetched concurrently.
+        :return: List of BulkResult in input order.
+        """
+        return await self._fetch_bulk(APIURL.clan, clan_tags, self.models.Clan, chunk_size, concurrency)
 
     async def get_tournament(self, tag):
         """Get tournament detail."""
-        url = APIURL.tournaments.format(tag)
-        data = await self.fetch(url)
-        return Tournament(data)
+        return await self._call(self._tournament(tag))
 
     async def get_constants(self, key=None):
         """Fetch contants.
 
         :param key: Optional field.
         """
-        url = APIURL.constants
-        data = await self.fetch(url)
-        return Constants(data)
+        return await self._call(self._constants_endpoint())
 
     async def get_top_players(self, location=''):
         """Fetch top players."""
-        url = APIURL.top_players.format(location)
-        data = await self.fetch(url)
-        return Players(data)
+        return await self._call(self._top_players(location))
 
     async def get_top_clans(self, location=''):
         """Fetch top clans."""
-        url = APIURL.top_clans.format(location)
-        data = await self.fetch(url)
-        return Clans(data)
+        return await self._call(self._top_clans(location))
 
     async def get_endpoints(self):
         """Endpoints."""
-        url = APIURL.endpoints
-        data = await self.fetch(url)
-        return EndPoints(data)
+        return await self._call(self._endpoints())
 
     async def get_version(self):
         """API verision."""
-        url = APIURL.version
-        data = await self.fetch(url, is_json=False)
-        return data
+        return await self._call(self._version())
 
     async def get_popular_players(self):
         """Fetch popular players."""
-        url = APIURL.popular_players
-        data = await self.fetch(url)
-        return Players(data)
+        return await self._call(self._popular_players())
 
     async def get_popular_clans(self):
         """Fetch popular players."""
-        url = APIURL.popular_clans
-        data = await self.fetch(url)
-        return Clans(data)
+        return await self._call(self._popular_clans())
 
     async def get_popular_tournaments(self):
         """Fetch popular tournaments."""
-        url = APIURL.popular_tournaments
-        data = await self.fetch(url)
-        return Tournaments(data)
\ No newline at end of file
+        return await self._call(self._popular_tournaments())
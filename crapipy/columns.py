@@ -0,0 +1,314 @@
+"""
+Columnar collections.
+
+Tables hold a few fields of many players or clans in one column per field
+instead of one object per row. Tags are stored as integers (see
+:meth:`crapipy.models.Tag.encode`) and numbers as int64, in NumPy arrays if
+NumPy is installed or ``array.array`` otherwise. Names are kept in lists.
+
+Sorting, filtering and joining build new tables from row indexes, without
+creating an object per row:
+
+    players = PlayerTable.from_json(client.get_top_players())
+    clans = ClanTable.from_json(client.get_top_clans())
+    top = players.filter([t > 6000 for t in players['trophies']]).sort('trophies', reverse=True)
+    top = top.join(clans, on='clan_tag')
+    top.row(0)['clan_name']
+"""
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from .models import Tag
+from .util import snake_key
+
+TAG = 'tag'
+INT = 'int'
+STR = 'str'
+
+
+def _get(item, path):
+    """Return value at a path of camelCase keys, or None."""
+    for key in path:
+        if item is None:
+            return None
+        if isinstance(item, dict):
+            value = item.get(key)
+            if value is None:
+                # Box models only find snake_case keys with get.
+                value = item.get(snake_key(key))
+        else:
+            # Compact models
+            value = getattr(item, snake_key(key), None)
+        item = value
+    return item
+
+
+def _int_column(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int64)
+    return array('q', values)
+
+
+def _take(column, indexes):
+    """Return the values of column at row indexes."""
+    if isinstance(column, list):
+        return [column[i] for i in indexes]
+    if numpy is not None:
+        return column[numpy.asarray(indexes, dtype=numpy.intp)]
+    return array('q', [column[i] for i in indexes])
+
+
+def _take_or_default(column, indexes, default):
+    """Return the values of column at row indexes, default where the index is -1."""
+    if isinstance(column, list) or numpy is None:
+        values = [column[i] if i >= 0 else default for i in indexes]
+        return values if isinstance(column, list) else array('q', values)
+    indexes = numpy.asarray(indexes, dtype=numpy.intp)
+    if not len(column):
+        return numpy.full(len(indexes), default, dtype=numpy.int64)
+    return numpy.where(indexes >= 0, column[indexes], default)
+
+
+class Table:
+    """Columns of the same length.
+
+    Subclasses list their fields as ``(name, kind, paths)`` where kind is
+    TAG, INT or STR and paths are the alternative key paths of the field in
+    the API JSON. Missing numbers are stored as 0, missing tags as 0, which
+    is the ID of the empty tag, and missing strings as None.
+
+    Tables are not changed in place: every operation returns a new table,
+    so indexes built by :meth:`index` are kept for later lookups.
+    """
+
+    fields = ()
+
+    def __init__(self, columns):
+        """Init.
+
+        :param columns: OrderedDict of column name to column.
+        """
+        self.columns = columns
+        self.kinds = {name: kind for name, kind, _ in self.fields}
+        self._indexes = {}
+
+    @classmethod
+    def from_json(cls, items, fields=None):
+        """Build table from decoded JSON or models of the API.
+
+        :param items: List of decoded JSON objects or models.
+        :param fields: Optional names of the fields to keep. Defaults to all.
+        """
+        if not isinstance(items, list):
+            items = list(items)
+        columns = OrderedDict()
+        for name, kind, paths in cls.fields:
+            if fields is not None and name not in fields:
+                continue
+            values = []
+            for item in items:
+                value = None
+                for path in paths:
+                    value = _get(item, path)
+                    if value is not None:
+                        break
+                values.append(value)
+            if kind == TAG:
+                columns[name] = _int_column([Tag.encode(v) if v else 0 for v in values])
+            elif kind == INT:
+                columns[name] = _int_column([int(v) if v is not None else 0 for v in values])
+            else:
+                columns[name] = values
+        return cls(columns)
+
+    def _new(self, columns, kinds=None):
+        table = type(self)(columns)
+        if kinds is not None:
+            table.kinds = kinds
+        return table
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        """Return column by name."""
+        return self.columns[name]
+
+    def __repr__(self):
+        return "<{} rows={} columns={}>".format(type(self).__name__, len(self), ', '.join(self.columns))
+
+    def row(self, index):
+        """Return row as a dict, with tags as str."""
+        out = {}
+        for name, column in self.columns.items():
+            value = column[index]
+            if self.kinds.get(name) == TAG:
+                value = Tag.decode(value) if value else None
+            elif not isinstance(column, list):
+                value = int(value)
+            out[name] = value
+        return out
+
+    def to_columns(self, decode_tags=True):
+        """Return OrderedDict of column name to column.
+
+        :param decode_tags: Return tag columns as lists of str instead of IDs.
+        """
+        columns = OrderedDict()
+        for name, column in self.columns.items():
+            if decode_tags and self.kinds.get(name) == TAG:
+                column = [Tag.decode(v) if v else None for v in column.tolist()]
+            columns[name] = column
+        return columns
+
+    def to_arrow(self, decode_tags=True):
+        """Return table as a pyarrow Table. Requires pyarrow."""
+        if pyarrow is None:
+            raise ImportError("pyarrow is required to export to Arrow.")
+        columns = self.to_columns(decode_tags)
+        return pyarrow.Table.from_pydict(OrderedDict(
+            (name, pyarrow.array(c if isinstance(c, list) or numpy is not None else c.tolist()))
+            for name, c in columns.items()
+        ))
+
+    def to_pandas(self, decode_tags=True):
+        """Return table as a pandas DataFrame. Requires pandas."""
+        if pandas is None:
+            raise ImportError("pandas is required to export to a DataFrame.")
+        columns = self.to_columns(decode_tags)
+        return pandas.DataFrame(columns, columns=list(columns))
+
+    def rows(self):
+        """Iterate over rows as dicts."""
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def take(self, indexes):
+        """Return table of the rows at the given indexes."""
+        return self._new(OrderedDict((name, _take(column, indexes)) for name, column in self.columns.items()), self.kinds)
+
+    def filter(self, mask):
+        """Return table of the rows where mask is true.
+
+        :param mask: Sequence of bools, one per row.
+        """
+        if numpy is not None:
+            indexes = numpy.flatnonzero(numpy.asarray(mask, dtype=bool))
+        else:
+            indexes = [i for i, keep in enumerate(mask) if keep]
+        return self.take(indexes)
+
+    def sort(self, name, reverse=False):
+        """Return table sorted by a column. The sort is stable."""
+        column = self.columns[name]
+        if numpy is not None and not isinstance(column, list):
+            indexes = numpy.argsort(-column if reverse else column, kind='stable')
+        else:
+            indexes = sorted(range(len(column)), key=column.__getitem__, reverse=reverse)
+        return self.take(indexes)
+
+    def index(self, name='tag'):
+        """Return dict of column value to the first row index with it."""
+        index = self._indexes.get(name)
+        if index is None:
+            column = self.columns[name]
+            index = {}
+            for i, value in enumerate(column if isinstance(column, list) else column.tolist()):
+                index.setdefault(value, i)
+            self._indexes[name] = index
+        return index
+
+    def find(self, tag):
+        """Return row index of a tag, or None."""
+        return self.index('tag').get(Tag.encode(tag))
+
+    def join(self, other, on, other_on='tag', prefix=None):
+        """Return table with the matching row of another table added to each row.
+
+        Rows without a match get the missing values of each column.
+
+        :param other: Table to join.
+        :param on: Column of this table.
+        :param other_on: Column of other matched against on.
+        :param prefix: Prefix of the columns added from other. Defaults to on
+                       without its last part, e.g. clan_ for clan_tag.
+        """
+        if prefix is None:
+            prefix = on.rsplit('_', 1)[0] + '_' if '_' in on else ''
+        index = other.index(other_on)
+        keys = self.columns[on]
+        keys = keys if isinstance(keys, list) else keys.tolist()
+        positions = [index.get(key, -1) for key in keys]
+        columns = OrderedDict(self.columns)
+        kinds = dict(self.kinds)
+        for name, column in other.columns.items():
+            if name == other_on:
+                continue
+            kind = other.kinds.get(name)
+            columns[prefix + name] = _take_or_default(column, positions, None if kind == STR else 0)
+            kinds[prefix + name] = kind
+        return self._new(columns, kinds)
+
+
+class PlayerTable(Table):
+    """Columns of players."""
+
+    fields = (
+        ('tag', TAG, (('tag',),)),
+        ('name', STR, (('name',),)),
+        ('trophies', INT, (('trophies',),)),
+        ('exp_level', INT, (('expLevel',), ('stats', 'level'))),
+        ('rank', INT, (('rank',),)),
+        ('arena_id', INT, (('arena', 'arenaID'),)),
+        ('clan_tag', TAG, (('clan', 'tag'),)),
+    )
+
+
+class ClanTable(Table):
+    """Columns of clans."""
+
+    fields = (
+        ('tag', TAG, (('tag',),)),
+        ('name', STR, (('name',),)),
+        ('score', INT, (('score',),)),
+        ('member_count', INT, (('memberCount',),)),
+        ('required_score', INT, (('requiredScore',),)),
+        ('donations', INT, (('donations',),)),
+        ('rank', INT, (('rank',),)),
+        ('location', STR, (('location', 'name'),)),
+    )
+
+
+class TournamentTable(Table):
+    """Columns of tournaments."""
+
+    fields = (
+        ('tag', TAG, (('tag',),)),
+        ('name', STR, (('name',),)),
+        ('type', STR, (('type',),)),
+        ('status', STR, (('status',),)),
+        ('capacity', INT, (('capacity',),)),
+        ('max_capacity', INT, (('maxCapacity',),)),
+        ('preparation_duration', INT, (('preparationDuration',),)),
+        ('duration', INT, (('duration',),)),
+        ('create_time', INT, (('createTime',),)),
+        ('start_time', INT, (('startTime',),)),
+        ('creator_tag', TAG, (('creator', 'tag'),)),
+    )
@@ -0,0 +1,213 @@
+"""
+Compact data models.
+
+These models are an alternative to the Box based models in
+:mod:`crapipy.models` for holding many objects in memory. Each model is a
+``__slots__`` class with snake_case attributes. Nested objects are wrapped
+in their own compact model and lists stay plain lists. Attributes which
+are not part of a model's slots are kept as decoded JSON in ``extra`` and
+are still readable as attributes.
+
+Select them per client with ``Client(model_type='compact')``.
+"""
+from .models import TableMixin
+from .util import snake_key
+
+
+class CompactModel:
+    """Base compact model."""
+
+    __slots__ = ('extra',)
+
+    # Attribute name to model class for nested objects or lists of objects.
+    _models = {}
+
+    def __init__(self, data):
+        extra = None
+        for key, value in data.items():
+            attr = snake_key(key)
+            if attr in _fields(type(self)):
+                model = self._models.get(attr)
+                if model is not None and value is not None:
+                    if isinstance(value, list):
+                        value = model(value) if issubclass(model, CompactList) else [model(v) for v in value]
+                    else:
+                        value = model(value)
+                object.__setattr__(self, attr, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[attr] = value
+        self.extra = extra
+
+    def __getattr__(self, item):
+        if item in _fields(type(self)):
+            return None
+        extra = object.__getattribute__(self, 'extra')
+        if extra is not None and item in extra:
+            return extra[item]
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, item))
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        name = getattr(self, 'name', None)
+        tag = getattr(self, 'tag', None)
+        return "<{} {}>".format(type(self).__name__, ' '.join(str(v) for v in (tag, name) if v is not None))
+
+    def to_dict(self):
+        """Return model as a dict with snake_case keys."""
+        out = {}
+        for attr in _fields(type(self)):
+            value = getattr(self, attr)
+            if value is not None:
+                out[attr] = _to_plain(value)
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+
+class CompactList(list):
+    """List of compact models."""
+
+    __slots__ = ()
+
+    model = CompactModel
+
+    def __init__(self, data=()):
+        super().__init__(d if isinstance(d, CompactModel) else self.model(d) for d in data)
+
+    def to_list(self):
+        """Return list of dicts."""
+        return [_to_plain(d) for d in self]
+
+
+_field_cache = {}
+
+
+def _fields(cls):
+    """Return set of slot names of a model class and its bases."""
+    fields = _field_cache.get(cls)
+    if fields is None:
+        fields = frozenset(
+            slot for klass in cls.__mro__ for slot in getattr(klass, '__slots__', ()) if slot != 'extra'
+        )
+        _field_cache[cls] = fields
+    return fields
+
+
+def _to_plain(value):
+    if isinstance(value, CompactModel):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    return value
+
+
+class Arena(CompactModel):
+    """Arena."""
+    __slots__ = ('name', 'arena', 'arena_id', 'trophy_limit')
+
+
+class Badge(CompactModel):
+    """Clan badge."""
+    __slots__ = ('name', 'category', 'id', 'image')
+
+
+class Location(CompactModel):
+    """Location."""
+    __slots__ = ('name', 'is_country', 'code')
+
+
+class Card(CompactModel):
+    """Card."""
+    __slots__ = (
+        'name', 'level', 'max_level', 'count', 'rarity', 'required_for_upgrade', 'left_to_upgrade',
+        'icon', 'key', 'elixir', 'type', 'arena', 'description', 'id'
+    )
+
+
+class Deck(CompactList):
+    """Deck of cards."""
+    __slots__ = ()
+    model = Card
+
+    @property
+    def average_elixir(self):
+        """Return average elixir cost of the deck."""
+        costs = [card.elixir for card in self if card.elixir is not None]
+        if not costs:
+            return None
+        return sum(costs) / len(costs)
+
+
+class PlayerClan(CompactModel):
+    """Clan of a player."""
+    __slots__ = ('tag', 'name', 'role', 'donations', 'donations_received', 'donations_delta', 'badge')
+    _models = {'badge': Badge}
+
+
+class Player(CompactModel):
+    """Player profile."""
+    __slots__ = (
+        'tag', 'name', 'trophies', 'rank', 'previous_rank', 'exp_level', 'donations_delta', 'arena', 'clan',
+        'stats', 'games', 'chest_cycle', 'league_statistics', 'deck_link', 'current_deck', 'cards',
+        'achievements', 'battles'
+    )
+    _models = {'arena': Arena, 'clan': PlayerClan, 'current_deck': Deck, 'cards': Deck}
+
+
+class ClanMember(CompactModel):
+    """Clan member."""
+    __slots__ = (
+        'name', 'tag', 'rank', 'previous_rank', 'role', 'exp_level', 'trophies', 'clan_chest_crowns',
+        'donations', 'donations_received', 'donations_delta', 'donations_percent', 'arena'
+    )
+    _models = {'arena': Arena}
+
+
+class Clan(CompactModel):
+    """Clan."""
+    __slots__ = (
+        'tag', 'name', 'description', 'type', 'score', 'member_count', 'required_score', 'donations',
+        'rank', 'previous_rank', 'clan_chest', 'badge', 'location', 'members'
+    )
+    _models = {'badge': Badge, 'location': Location, 'members': ClanMember}
+
+
+class TournamentPlayer(CompactModel):
+    """Tournament creator or member."""
+    __slots__ = ('tag', 'name', 'score')
+
+
+class Tournament(CompactModel):
+    """Tournament."""
+    __slots__ = (
+        'tag', 'type', 'status', 'name', 'description', 'capacity', 'max_capacity', 'preparation_duration',
+        'duration', 'ended_time', 'start_time', 'create_time', 'creator', 'members'
+    )
+    _models = {'creator': TournamentPlayer, 'members': TournamentPlayer}
+
+
+class Players(CompactList, TableMixin):
+    """List of players."""
+    __slots__ = ()
+    model = Player
+    table_name = 'PlayerTable'
+
+
+class Clans(CompactList, TableMixin):
+    """List of clans."""
+    __slots__ = ()
+    model = Clan
+    table_name = 'ClanTable'
+
+
+class Tournaments(CompactList, TableMixin):
+    """List of tournaments."""
+    __slots__ = ()
+    model = Tournament
+    table_name = 'TournamentTable'
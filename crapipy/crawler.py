@@ -0,0 +1,311 @@
+"""
+Crawler of the clan-member graph.
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import logging
+import os
+import time
+
+from .bulk import MAX_TAGS_PER_REQUEST
+from .client import RawModels
+from .models import Tag
+from .url import APIURL
+
+logger = logging.getLogger(__name__)
+
+CLAN = 'clan'
+PLAYER = 'player'
+
+
+def by_depth(kind, tag, depth, info):
+    """Default priority: breadth first."""
+    return depth
+
+
+class Crawler:
+    """Crawl clans and players with an AsyncClient.
+
+    Starting from seed tags, each fetched clan adds its members to the
+    frontier and each fetched player adds its clan. Tags are visited once.
+    The frontier is ordered by priority, lowest first, breadth first by
+    default. ``concurrency`` workers take up to ``batch_size`` tags of the
+    same kind from the frontier and fetch them with one multi-tag request,
+    waiting on the client's rate limiter if it has one, so the rate limit
+    budget is used by full requests.
+
+    Fetched clans and players are passed to the ``on_clan`` and
+    ``on_player`` callbacks, which may be coroutine functions.
+
+    With ``checkpoint`` set, the visited tags and the frontier are saved to
+    that file every ``checkpoint_interval`` seconds and when the crawl
+    stops. A new crawler with the same checkpoint file resumes from it.
+
+        crawler = Crawler(client, on_player=store, max_depth=3, checkpoint='crawl.json')
+        await crawler.add_top_clans()
+        await crawler.run()
+    """
+
+    def __init__(self, client, on_clan=None, on_player=None, concurrency=4, batch_size=MAX_TAGS_PER_REQUEST,
+                 fetch_players=True, max_depth=None, max_items=None, priority=by_depth,
+                 checkpoint=None, checkpoint_interval=60):
+        """Init.
+
+        :param client: AsyncClient sending the requests.
+        :param on_clan: Called with each fetched clan.
+        :param on_player: Called with each fetched player.
+        :param concurrency: Max number of requests in flight.
+        :param batch_size: Max tags per request.
+        :param fetch_players: Fetch the profiles of clan members. If False only clans are crawled.
+        :param max_depth: Max number of hops from the seed tags.
+        :param max_items: Stop taking new batches once this many clans and players were fetched.
+        :param priority: Function of (kind, tag, depth, info) returning the priority of a
+                         discovered tag, lowest first. info is the clan member entry of
+                         players or the player's clan entry of clans, None for seeds.
+        :param checkpoint: Path of the checkpoint file.
+        :param checkpoint_interval: Seconds between checkpoints.
+        """
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1.")
+        self.client = client
+        self.on_clan = on_clan
+        self.on_player = on_player
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.fetch_players = fetch_players
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.priority = priority
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+
+        # Tag IDs (see Tag.encode) of every tag added to the frontier, per kind.
+        self.visited = {CLAN: set(), PLAYER: set()}
+        self._frontier = {CLAN: [], PLAYER: []}
+        self._inflight = {}
+        self._counter = itertools.count()
+        self._active = 0
+        self._changed = None
+        self._stopped = False
+        self._last_checkpoint = time.monotonic()
+
+        self.requests = 0
+        self.clans = 0
+        self.players = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self._started = None
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load_checkpoint()
+
+    def __len__(self):
+        """Return number of tags in the frontier."""
+        return len(self._frontier[CLAN]) + len(self._frontier[PLAYER])
+
+    def add(self, kind, tag, depth=0, info=None, priority=None):
+        """Add a tag to the frontier unless it was already added.
+
+        Invalid tags are logged and counted in errors.
+
+        :return: True if the tag was added.
+        """
+        tag = Tag.normalize(tag)
+        try:
+            tag_id = Tag.encode(tag)
+        except ValueError:
+            self.errors += 1
+            logger.warning("Crawler skipped invalid {} tag {}".format(kind, tag))
+            return False
+        if tag_id in self.visited[kind]:
+            return False
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if priority is None:
+            priority = self.priority(kind, tag, depth, info)
+        self.visited[kind].add(tag_id)
+        heapq.heappush(self._frontier[kind], (priority, next(self._counter), tag, depth))
+        if self._changed is not None:
+            self._changed.set()
+        return True
+
+    def add_clans(self, tags, depth=0):
+        """Add clan tags to the frontier."""
+        for tag in tags:
+            self.add(CLAN, tag, depth)
+
+    def add_players(self, tags, depth=0):
+        """Add player tags to the frontier."""
+        for tag in tags:
+            self.add(PLAYER, tag, depth)
+
+    async def add_top_clans(self, location=''):
+        """Add the top clans of a location to the frontier."""
+        clans = await self.client.fetch(APIURL.top_clans.format(location))
+        self.add_clans(clan['tag'] for clan in clans)
+
+    def _next_batch(self):
+        """Pop a batch of tags of one kind, taking the kind of the lowest priority first."""
+        clans, players = self._frontier[CLAN], self._frontier[PLAYER]
+        if not clans and not players:
+            return None, None
+        kind = CLAN if clans and (not players or clans[0] <= players[0]) else PLAYER
+        frontier = self._frontier[kind]
+        batch = []
+        while frontier and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(frontier))
+        return kind, batch
+
+    async def run(self):
+        """Crawl until the frontier is empty or max_items is reached."""
+        self._stopped = False
+        self._changed = asyncio.Event()
+        self._started = time.monotonic()
+        elapsed = self.elapsed
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # Stop the other workers when one fails, and wait for them so
+            # that their batches are back in the frontier.
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.elapsed = elapsed + time.monotonic() - self._started
+            self._started = None
+            if self.checkpoint is not None:
+                self.save_checkpoint()
+
+    def stop(self):
+        """Stop the crawl after the requests in flight."""
+        self._stopped = True
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _worker(self):
+        while not self._stopped:
+            kind, batch = self._next_batch()
+            if batch is None:
+                if self._active == 0:
+                    # Nothing left to fetch and nothing in flight to add more.
+                    self._changed.set()
+                    return
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            key = next(self._counter)
+            self._inflight[key] = (kind, batch)
+            self._active += 1
+            try:
+                await self._fetch(kind, batch)
+            except BaseException:
+                # Put back the tags which were not processed, including on
+                # cancellation, so that a resumed crawl fetches them.
+                for entry in batch:
+                    heapq.heappush(self._frontier[kind], entry)
+                raise
+            finally:
+                self._active -= 1
+                del self._inflight[key]
+                self._changed.set()
+            if self.max_items is not None and self.clans + self.players >= self.max_items:
+                self.stop()
+            if self.checkpoint is not None and \
+                    time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                self.save_checkpoint()
+
+    async def _fetch(self, kind, batch):
+        """Fetch a batch of tags, pass the results on and add the tags they link to.
+
+        Entries are removed from batch as they are processed.
+        """
+        tags = [tag for _, _, tag, _ in batch]
+        url = APIURL.clan if kind == CLAN else APIURL.player
+        self.requests += 1
+        results = await self.client._fetch_chunk(url, tags, RawModels.Clan)
+        while batch:
+            _, _, tag, depth = batch[0]
+            data = results.get(tag)
+            if isinstance(data, Exception):
+                self.errors += 1
+                logger.warning("Crawler failed to fetch {} {}: {}".format(kind, tag, data))
+            elif kind == CLAN:
+                if self.fetch_players:
+                    for member in data.get('members') or ():
+                        self.add(PLAYER, member['tag'], depth + 1, member)
+                await self._call(self.on_clan, self.client.models.Clan(data))
+                self.clans += 1
+            else:
+                clan = data.get('clan')
+                if clan and clan.get('tag'):
+                    self.add(CLAN, clan['tag'], depth + 1, clan)
+                await self._call(self.on_player, self.client.models.Player(data))
+                self.players += 1
+            del batch[0]
+
+    @staticmethod
+    async def _call(callback, value):
+        if callback is not None:
+            result = callback(value)
+            if inspect.isawaitable(result):
+                await result
+
+    def stats(self):
+        """Return counters and throughput of the crawl."""
+        elapsed = self.elapsed
+        if self._started is not None:
+            elapsed += time.monotonic() - self._started
+        items = self.clans + self.players
+        return dict(
+            requests=self.requests,
+            clans=self.clans,
+            players=self.players,
+            errors=self.errors,
+            frontier=len(self),
+            in_flight=sum(len(batch) for _, batch in self._inflight.values()),
+            visited=len(self.visited[CLAN]) + len(self.visited[PLAYER]),
+            elapsed=elapsed,
+            items_per_second=items / elapsed if elapsed else 0.0,
+            requests_per_second=self.requests / elapsed if elapsed else 0.0,
+        )
+
+    def save_checkpoint(self):
+        """Write the crawl state to the checkpoint file."""
+        frontier = []
+        for kind, entries in self._frontier.items():
+            frontier.extend([kind, tag, depth, priority] for priority, _, tag, depth in entries)
+        # Batches in flight are fetched again on resume.
+        for kind, batch in self._inflight.values():
+            frontier.extend([kind, tag, depth, priority] for priority, _, tag, depth in batch)
+        state = dict(
+            visited={kind: sorted(ids) for kind, ids in self.visited.items()},
+            frontier=frontier,
+            counters=dict(requests=self.requests, clans=self.clans, players=self.players,
+                          errors=self.errors, elapsed=self.elapsed),
+        )
+        path = self.checkpoint + '.tmp'
+        with open(path, 'w') as f:
+            json.dump(state, f)
+        os.replace(path, self.checkpoint)
+        self._last_checkpoint = time.monotonic()
+
+    def load_checkpoint(self):
+        """Restore the crawl state from the checkpoint file."""
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.visited = {kind: set(state['visited'].get(kind, ())) for kind in (CLAN, PLAYER)}
+        self._frontier = {CLAN: [], PLAYER: []}
+        for kind, tag, depth, priority in state['frontier']:
+            entry = (priority, next(self._counter), tag, depth)
+            self._frontier[kind].append(entry)
+        for frontier in self._frontier.values():
+            heapq.heapify(frontier)
+        counters = state.get('counters', {})
+        self.requests = counters.get('requests', 0)
+        self.clans = counters.get('clans', 0)
+        self.players = counters.get('players', 0)
+        self.errors = counters.get('errors', 0)
+        self.elapsed = counters.get('elapsed', 0.0)
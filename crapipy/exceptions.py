@@ -12,6 +12,8 @@ class APIError(BaseException):
         self.error = error
         self.status = status
         self.message = message
+        # Request of the failed attempt, set by the clients.
+        self.request = None
 
 
 
@@ -20,7 +22,13 @@ class APITimeoutError(APIError):
         super().__init__(**kwargs)
 
 
-class APIClientResponseError(APIError):
+class APIConnectionError(APIError):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+
+class APIClientResponseError(APIError):
+    def __init__(self, retry_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.retry_after = retry_after
+
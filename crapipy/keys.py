@@ -0,0 +1,28 @@
+"""
+Known keys of cr-api responses.
+
+Used to pre-seed the camelCase to snake_case key conversion table shared
+by all models, so that converting these keys is a dict lookup from the
+first response on.
+"""
+
+API_KEYS = (
+    'achievements', 'arena', 'arenaID', 'arenas', 'badge', 'battles', 'bestSeason',
+    'bestTrophies', 'capacity', 'cardKey', 'cardLevels', 'cards', 'cardsFound', 'category',
+    'challengeCardsWon', 'challengeMaxWins', 'challengeType', 'chestCycle', 'chests', 'clan',
+    'clanChest', 'clanChestCrowns', 'clanChestCrownsPercent', 'code', 'count', 'createTime',
+    'creator', 'crowns', 'crownsEarned', 'currentDeck', 'currentSeason', 'deck', 'deckLink',
+    'deckType', 'description', 'donations', 'donationsDelta', 'donationsPercent',
+    'donationsReceived', 'draws', 'drawsPercent', 'duration', 'elixir', 'endedTime', 'epic',
+    'expLevel', 'favoriteCard', 'games', 'giant', 'hits', 'hitsPerDayAvg', 'icon', 'iconUrls',
+    'id', 'image', 'info', 'isCountry', 'key', 'leagueStatistics', 'leftToUpgrade', 'legendary',
+    'level', 'location', 'losses', 'lossesPercent', 'magical', 'maxCapacity', 'maxLevel',
+    'maxTrophies', 'medium', 'memberCount', 'members', 'mode', 'name', 'opponent',
+    'opponentCrowns', 'order', 'overtimeSeconds', 'players', 'popularity',
+    'preparationDuration', 'previousRank', 'previousSeason', 'rank', 'rarities', 'rarity',
+    'regions', 'requiredForUpgrade', 'requiredScore', 'role', 'sameDeck', 'score', 'stars',
+    'startTime', 'startTrophies', 'stats', 'status', 'superMagical', 'tag', 'target', 'team',
+    'teamCrowns', 'teamSize', 'threeCrownWins', 'total', 'totalDonations', 'tournamentCardsWon',
+    'tournamentGames', 'trophies', 'trophyLimit', 'type', 'upcoming', 'utcTime', 'value',
+    'winner', 'wins', 'winsPercent',
+)
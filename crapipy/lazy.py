@@ -0,0 +1,171 @@
+"""
+Lazy data models.
+
+These models wrap decoded JSON without converting it up front. Nested
+objects and lists are wrapped the first time they are accessed and the
+wrapper is kept for later accesses. Like the Box models in
+:mod:`crapipy.models`, values can be read as dict items or attributes,
+with either the original camelCase keys or snake_case keys:
+
+    player.arena.arena_id == player['arena']['arenaID']
+
+Keys keep their original camelCase spelling in the underlying dict, so
+iterating over a model or calling ``to_dict()`` returns the JSON keys.
+
+Select them per client with ``Client(model_type='lazy')``.
+"""
+import json
+
+from .models import TableMixin
+from .util import snake_key
+
+# snake_case key to the original keys seen with that spelling.
+_raw_keys = {}
+
+
+def _wrap(value):
+    if type(value) is dict:
+        return LazyModel(value)
+    if type(value) is list:
+        return LazyListModel(value)
+    return value
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+class LazyModel(dict):
+    """Dict of decoded JSON wrapping nested values on access."""
+
+    __slots__ = ()
+
+    def __init__(self, data=None, **kwargs):
+        # A shallow copy: wrapped values are stored in the model, never in data.
+        super().__init__(data or {}, **kwargs)
+
+    def _raw_key(self, item):
+        """Return the key of this dict spelled item in snake_case, or None."""
+        for key in _raw_keys.get(item, ()):
+            if dict.__contains__(self, key):
+                return key
+        for key in self:
+            snake = snake_key(key)
+            if snake == item:
+                _raw_keys.setdefault(snake, []).append(key)
+                return key
+        return None
+
+    def __getitem__(self, item):
+        try:
+            value = dict.__getitem__(self, item)
+        except KeyError:
+            if not isinstance(item, str):
+                raise
+            key = self._raw_key(item)
+            if key is None:
+                raise
+            item = key
+            value = dict.__getitem__(self, item)
+        wrapped = _wrap(value)
+        if wrapped is not value:
+            dict.__setitem__(self, item, wrapped)
+        return wrapped
+
+    def __getattr__(self, item):
+        try:
+            return self[item]
+        except KeyError:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, item))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Return model as plain dicts and lists."""
+        return _plain(self)
+
+    def to_json(self, **kwargs):
+        """Return model as JSON."""
+        return json.dumps(self, **kwargs)
+
+
+class LazyListModel(list):
+    """List of decoded JSON wrapping items on access."""
+
+    __slots__ = ()
+
+    # Model class of items which are objects.
+    model = LazyModel
+
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return type(self)(value)
+        if type(value) is dict:
+            wrapped = self.model(value)
+        elif type(value) is list:
+            wrapped = LazyListModel(value)
+        else:
+            return value
+        list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _rows(self):
+        # Read fields from the items without wrapping them.
+        return list.__iter__(self)
+
+    def to_list(self):
+        """Return list as plain dicts and lists."""
+        return _plain(self)
+
+    def to_json(self, **kwargs):
+        """Return list as JSON."""
+        return json.dumps(self, **kwargs)
+
+
+class Clan(LazyModel):
+    """Clan."""
+    __slots__ = ()
+
+
+class Player(LazyModel):
+    """Player profile."""
+    __slots__ = ()
+
+
+class Tournament(LazyModel):
+    """Tournament."""
+    __slots__ = ()
+
+
+class Players(LazyListModel, TableMixin):
+    """List of players."""
+    __slots__ = ()
+    model = Player
+    table_name = 'PlayerTable'
+
+
+class Clans(LazyListModel, TableMixin):
+    """List of clans."""
+    __slots__ = ()
+    model = Clan
+    table_name = 'ClanTable'
+
+
+class Tournaments(LazyListModel, TableMixin):
+    """List of tournaments."""
+    __slots__ = ()
+    model = Tournament
+    table_name = 'TournamentTable'
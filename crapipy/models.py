@@ -1,8 +1,21 @@
 """
 Data models
 """
+import re
+
 from box import Box, BoxList
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .keys import API_KEYS
+from .util import seed_snake_keys
+
+# The compact and lazy models convert keys through the shared table.
+seed_snake_keys(API_KEYS)
+
 
 class BaseModel(Box):
     """
@@ -15,6 +28,40 @@ class BaseModel(Box):
         })
         super().__init__(*args, **kwargs)
 
+class TableMixin:
+    """Export of model lists to the tables of :mod:`crapipy.columns`."""
+
+    __slots__ = ()
+
+    # Name of the table class in crapipy.columns.
+    table_name = None
+
+    def _rows(self):
+        """Return the items to read fields from."""
+        return self
+
+    def to_table(self, fields=None):
+        """Return list as a table.
+
+        :param fields: Optional names of the fields to keep. Defaults to all.
+        """
+        # crapipy.columns imports this module.
+        from . import columns
+        return getattr(columns, self.table_name).from_json(self._rows(), fields)
+
+    def to_columns(self, fields=None, decode_tags=True):
+        """Return OrderedDict of field name to column."""
+        return self.to_table(fields).to_columns(decode_tags)
+
+    def to_arrow(self, fields=None, decode_tags=True):
+        """Return list as a pyarrow Table. Requires pyarrow."""
+        return self.to_table(fields).to_arrow(decode_tags)
+
+    def to_pandas(self, fields=None, decode_tags=True):
+        """Return list as a pandas DataFrame. Requires pandas."""
+        return self.to_table(fields).to_pandas(decode_tags)
+
+
 class BaseListModel(BoxList):
     """
     Base model.
@@ -45,13 +92,17 @@ class Tournament(BaseModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-class Players(BaseListModel):
+class Players(BaseListModel, TableMixin):
     """Top Players"""
+    table_name = 'PlayerTable'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-class Clans(BaseListModel):
+class Clans(BaseListModel, TableMixin):
     """Top Clans."""
+    table_name = 'ClanTable'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -60,37 +111,143 @@ class EndPoints(BaseListModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-class Tournaments(BaseListModel):
+class Tournaments(BaseListModel, TableMixin):
     """Endpoints."""
+    table_name = 'TournamentTable'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
 
 class Constants(BaseModel):
+    """Game constants.
+
+    Constants are read-only so that a single instance can be shared as a
+    lookup table. Lookups by card, arena, chest and rarity fields go
+    through hash indexes built on first use.
+    """
+
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault('frozen_box', True)
         super().__init__(*args, **kwargs)
+        object.__setattr__(self, '_indexes', {})
+
+    def _index(self, collection, field):
+        """Return dict of field value to the first item of collection with it."""
+        index = self._indexes.get((collection, field))
+        if index is None:
+            index = {}
+            for item in self.get(collection) or ():
+                value = item.get(field)
+                if value is not None and value not in index:
+                    index[value] = item
+            self._indexes[(collection, field)] = index
+        return index
+
+    def _lookup(self, collection, *fields):
+        """Return first item of collection matching one of the (field, value) pairs."""
+        for field, value in fields:
+            if value is not None:
+                item = self._index(collection, field).get(value)
+                if item is not None:
+                    return item
+        return None
 
     def get_chest_by_index(self, index):
         """Return chest by index."""
         order = self.chest_cycle.order
         return order[index % len(order)]
 
-    def get_card(self, key=None, card_key=None, name=None):
+    def _chest_distances(self):
+        """Return dict of chest to the distance to its next position from each cycle index.
+
+        Distances are arrays if NumPy is installed, lists otherwise.
+        """
+        table = self._indexes.get('chest_distances')
+        if table is None:
+            order = self.chest_cycle.order
+            size = len(order)
+            table = {}
+            for chest in set(order):
+                distances = [0] * size
+                # Walk the cycle backwards twice so that the last positions
+                # see the first occurrence of the next cycle.
+                next_position = None
+                for i in range(2 * size - 1, -1, -1):
+                    if order[i % size] == chest:
+                        next_position = i
+                    if i < size:
+                        distances[i] = next_position - i
+                table[chest] = numpy.array(distances) if numpy is not None else distances
+            self._indexes['chest_distances'] = table
+        return table
+
+    def get_upcoming_chests(self, index, count=10):
+        """Return the next chests of a cycle.
+
+        :param index: Cycle index of the next chest.
+        :param count: Number of chests.
+        :return: list of count chests, starting with the chest at index.
+        """
+        order = self.chest_cycle.order
+        start = index % len(order)
+        repeat = (start + count) // len(order) + 1
+        return list((order * repeat)[start:start + count])
+
+    def get_chest_distances(self, index):
+        """Return number of chests before each chest of the cycle comes up.
+
+        :param index: Cycle index of the next chest.
+        :return: dict of chest to distance. 0 means the next chest is of that type.
+        """
+        position = index % len(self.chest_cycle.order)
+        return {chest: int(distances[position]) for chest, distances in self._chest_distances().items()}
+
+    def get_chest_distances_many(self, indexes):
+        """Return chest distances of many cycle indexes at once.
+
+        :param indexes: Cycle indexes, e.g. of several players.
+        :return: dict of chest to the distances of each index, as an array if
+                 NumPy is installed or a list otherwise.
+        """
+        size = len(self.chest_cycle.order)
+        table = self._chest_distances()
+        if numpy is not None:
+            positions = numpy.asarray(indexes) % size
+            return {chest: distances[positions] for chest, distances in table.items()}
+        positions = [i % size for i in indexes]
+        return {chest: [distances[p] for p in positions] for chest, distances in table.items()}
+
+    def get_card(self, key=None, card_key=None, name=None, id=None):
         """Return card by any property"""
-        for card in self.cards:
-            if card.key == key:
-                return card
-            if card.card_key == card_key:
-                return card
-            if card.name == name:
-                return card
-        return None
+        return self._lookup('cards', ('key', key), ('card_key', card_key), ('name', name), ('id', id))
+
+    def get_arena(self, arena=None, name=None, arena_id=None):
+        """Return arena by any property"""
+        return self._lookup('arenas', ('arena', arena), ('name', name), ('arena_id', arena_id))
+
+    def get_chest(self, name=None, id=None):
+        """Return chest by any property"""
+        return self._lookup('chests', ('name', name), ('id', id))
+
+    def get_rarity(self, name=None):
+        """Return rarity by name"""
+        return self._lookup('rarities', ('name', name))
+
+
+_TAG_CHARACTERS = "0289PYLQGRJCUV"
+_tag_valid_re = re.compile('[{}]*\\Z'.format(_TAG_CHARACTERS))
+_tag_invalid_re = re.compile('[^{}]'.format(_TAG_CHARACTERS))
+# Maps tag characters to the base 14 digits understood by int().
+_tag_to_digits = str.maketrans(_TAG_CHARACTERS, '0123456789abcd')
+# Tag IDs of the first tag of each length: 0, 1, 15, 211, ...
+_tag_id_offsets = [(14 ** length - 1) // 13 for length in range(32)]
 
 
 class Tag:
     """SuperCell tags."""
 
-    TAG_CHARACTERS = "0289PYLQGRJCUV"
+    TAG_CHARACTERS = _TAG_CHARACTERS
 
     def __init__(self, tag: str):
         """Init.
@@ -99,11 +256,7 @@ class Tag:
         Convert to uppercase.
         Convert Os to 0s if found.
         """
-        if tag.startswith('#'):
-            tag = tag[1:]
-        tag = tag.replace('O', '0')
-        tag = tag.upper()
-        self._tag = tag
+        self._tag = self.normalize(tag)
 
     def __str__(self):
         return self._tag
@@ -119,16 +272,84 @@ class Tag:
     @property
     def valid(self):
         """Return true if tag is valid."""
-        for c in self.tag:
-            if c not in self.TAG_CHARACTERS:
-                return False
-        return True
+        return _tag_valid_re.match(self._tag) is not None
 
     @property
     def invalid_chars(self):
         """Return list of invalid characters."""
-        invalids = []
-        for c in self.tag:
-            if c not in self.TAG_CHARACTERS:
-                invalids.append(c)
-        return invalids
+        return _tag_invalid_re.findall(self._tag)
+
+    @property
+    def id(self):
+        """Return tag as int. See :meth:`encode`."""
+        return self.encode(self._tag)
+
+    @classmethod
+    def from_id(cls, tag_id):
+        """Return Tag from an int returned by :meth:`encode`."""
+        return cls(cls.decode(tag_id))
+
+    @staticmethod
+    def normalize(tag):
+        """Return tag as str without Tag instance."""
+        if tag.startswith('#'):
+            tag = tag[1:]
+        return tag.replace('O', '0').upper()
+
+    @classmethod
+    def normalize_many(cls, tags):
+        """Return list of normalized tags."""
+        normalize = cls.normalize
+        return [normalize(tag) for tag in tags]
+
+    @classmethod
+    def validate_many(cls, tags):
+        """Normalize and validate tags.
+
+        :return: Tuple of the list of valid tags and the list of invalid
+                 tags, both normalized and in input order.
+        """
+        normalize = cls.normalize
+        match = _tag_valid_re.match
+        valid = []
+        invalid = []
+        for tag in tags:
+            tag = normalize(tag)
+            if match(tag) is not None:
+                valid.append(tag)
+            else:
+                invalid.append(tag)
+        return valid, invalid
+
+    @classmethod
+    def encode(cls, tag):
+        """Return a valid tag as int.
+
+        Tags are numbered in bijective base 14 over TAG_CHARACTERS, so
+        every tag has its own ID, including tags starting with 0. Tags of up
+        to 16 characters fit in a signed 64 bit integer.
+
+        :raises ValueError: if tag is invalid.
+        """
+        tag = cls.normalize(tag)
+        if _tag_valid_re.match(tag) is None:
+            raise ValueError("Invalid tag: {}".format(tag))
+        if not tag:
+            return 0
+        return int(tag.translate(_tag_to_digits), 14) + _tag_id_offsets[len(tag)]
+
+    @classmethod
+    def decode(cls, tag_id):
+        """Return tag str of an int returned by :meth:`encode`."""
+        tag_id = int(tag_id)
+        if tag_id < 0:
+            raise ValueError("Invalid tag ID: {}".format(tag_id))
+        length = 0
+        while _tag_id_offsets[length + 1] <= tag_id:
+            length += 1
+        value = tag_id - _tag_id_offsets[length]
+        chars = []
+        for _ in range(length):
+            value, digit = divmod(value, 14)
+            chars.append(_TAG_CHARACTERS[digit])
+        return ''.join(reversed(chars))
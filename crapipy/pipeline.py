@@ -0,0 +1,478 @@
+"""
+Request pipeline shared by Client and AsyncClient.
+
+Both clients send a request through the same steps: the cache is looked
+up, each attempt is prepared by the middlewares, sent by a transport and
+its response decoded, and failed attempts are retried. The steps are
+implemented once here, without any I/O: middlewares only return how long
+to wait and the clients do the waiting and the sending with a blocking
+or an asyncio transport. A middleware therefore applies to both clients.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, RequestException, Timeout
+
+from .cache import conditional_headers, validator_entry, validator_key
+from .exceptions import APIClientResponseError, APIConnectionError, APIError, APITimeoutError
+from .util import error_kwargs, retry_after
+
+logger = logging.getLogger(__name__)
+
+
+class Request:
+    """GET request of the pipeline.
+
+    ``context`` holds the state middlewares keep between the hooks of one
+    attempt, e.g. the validators sent with a conditional request.
+    """
+
+    __slots__ = ('url', 'is_json', 'headers', 'stream', 'sent', 'context')
+
+    def __init__(self, url, is_json=True, headers=None, stream=False):
+        self.url = url
+        self.is_json = is_json
+        self.headers = headers if headers is not None else {}
+        self.stream = stream
+        self.sent = None
+        self.context = {}
+
+
+class Response:
+    """Response returned by a transport.
+
+    ``body`` holds the bytes of the response. It is None for successful
+    stream requests, whose unread response is kept in ``raw``.
+    """
+
+    __slots__ = ('status', 'headers', 'body', 'encoding', 'raw')
+
+    def __init__(self, status, headers, body, encoding=None, raw=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.raw = raw
+
+    def text(self):
+        """Return body as str."""
+        return self.body.decode(self.encoding or 'utf-8', 'replace')
+
+
+class Middleware:
+    """Hooks into the pipeline. The default hooks do nothing.
+
+    :meth:`lookup` and :meth:`store` are called once per fetch, around all
+    attempts. :meth:`prepare`, :meth:`received`, :meth:`completed` and
+    :meth:`failed` are called for each attempt, with the same request
+    object, so state kept in ``request.context`` by :meth:`prepare` is
+    available to the later hooks of the attempt. Hooks must not block:
+    they return the seconds to wait instead of sleeping.
+    """
+
+    def lookup(self, request):
+        """Return data answering the request without sending it, or None."""
+        return None
+
+    def prepare(self, request):
+        """Update the request before it is sent and return seconds to wait first."""
+        return 0
+
+    def received(self, request, response):
+        """Inspect a response. Return data to use instead of decoding it, or None."""
+        return None
+
+    def completed(self, request, response, data):
+        """Inspect the decoded data of a successful response."""
+
+    def failed(self, request, error, attempt):
+        """Return seconds to wait before retrying a failed attempt, or None not to retry."""
+        return None
+
+    def store(self, request, data):
+        """Keep the data fetched for a request."""
+
+
+class CacheMiddleware(Middleware):
+    """Return decoded responses from a cache."""
+
+    def __init__(self, cache, ttl=None):
+        """Init.
+
+        :param cache: Cache instance, e.g. MemoryCache.
+        :param ttl: Optional dict of APIURL endpoint name to TTL in seconds.
+        """
+        self.cache = cache
+        self.ttl = ttl
+
+    def lookup(self, request):
+        return self.cache.get_response(request.url, is_json=request.is_json)
+
+    def store(self, request, data):
+        self.cache.set_response(request.url, data, is_json=request.is_json, ttl=self.ttl)
+
+
+class ValidatorMiddleware(Middleware):
+    """Send conditional requests and reuse the stored data of 304 responses.
+
+    Stream requests are sent unconditionally since their data is not kept.
+    """
+
+    def __init__(self, validators, ttl):
+        """Init.
+
+        :param validators: Cache instance storing ETag / Last-Modified validators.
+        :param ttl: Seconds validators and their data are kept.
+        """
+        self.validators = validators
+        self.ttl = ttl
+        self.revalidated = 0
+
+    def prepare(self, request):
+        if not request.stream:
+            entry = self.validators.get(validator_key(request.url, request.is_json))
+            if entry is not None:
+                request.context['validators'] = entry
+                request.headers.update(conditional_headers(entry))
+        return 0
+
+    def received(self, request, response):
+        entry = request.context.get('validators')
+        if response.status == 304 and entry is not None:
+            self.revalidated += 1
+            return entry['data']
+        return None
+
+    def completed(self, request, response, data):
+        if not request.stream:
+            entry = validator_entry(response.headers, data)
+            if entry is not None:
+                self.validators.set(validator_key(request.url, request.is_json), entry, self.ttl)
+
+
+class RateLimitMiddleware(Middleware):
+    """Wait for a RateLimiter token before each attempt and follow rate limit headers."""
+
+    def __init__(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+
+    def prepare(self, request):
+        return self.rate_limiter.reserve()
+
+    def received(self, request, response):
+        self.rate_limiter.update_from_headers(response.headers)
+        return None
+
+
+class RetryMiddleware(Middleware):
+    """Retry failed attempts as a RetryPolicy allows."""
+
+    def __init__(self, policy):
+        self.policy = policy
+
+    def failed(self, request, error, attempt):
+        if not self.policy.should_retry(error, attempt):
+            return None
+        return self.policy.delay(attempt, getattr(error, 'retry_after', None))
+
+
+class MetricsMiddleware(Middleware):
+    """Count requests, responses by status and errors, and time responses.
+
+    Latencies are measured from the moment the request may be sent, after
+    any rate limit wait, to the response. A single instance can be shared
+    by several clients.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def prepare(self, request):
+        with self._lock:
+            self.requests += 1
+        return 0
+
+    def received(self, request, response):
+        latency = time.monotonic() - request.sent if request.sent is not None else 0.0
+        with self._lock:
+            self.statuses[response.status] += 1
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return None
+
+    def failed(self, request, error, attempt):
+        with self._lock:
+            self.errors[type(error).__name__] += 1
+        return None
+
+    def stats(self):
+        """Return counters and latencies in seconds."""
+        with self._lock:
+            responses = sum(self.statuses.values())
+            return dict(
+                requests=self.requests,
+                statuses=dict(self.statuses),
+                errors=dict(self.errors),
+                mean_latency=self.latency / responses if responses else 0.0,
+                max_latency=self.max_latency,
+            )
+
+
+class Pipeline:
+    """Middlewares and response decoding shared by the clients."""
+
+    def __init__(self, middlewares, json_loads):
+        """Init.
+
+        :param middlewares: List of Middleware, called in order.
+        :param json_loads: Function decoding JSON from bytes.
+        """
+        self.middlewares = list(middlewares)
+        self.json_loads = json_loads
+
+    def find(self, cls):
+        """Return the first middleware which is an instance of cls, or None."""
+        for middleware in self.middlewares:
+            if isinstance(middleware, cls):
+                return middleware
+        return None
+
+    def lookup(self, request):
+        """Return data answering the request from a middleware, or None."""
+        for middleware in self.middlewares:
+            data = middleware.lookup(request)
+            if data is not None:
+                return data
+        return None
+
+    def store(self, request, data):
+        """Pass fetched data to the middlewares."""
+        for middleware in self.middlewares:
+            middleware.store(request, data)
+
+    def prepare(self, request):
+        """Prepare an attempt and return the seconds to wait before sending it."""
+        wait = 0
+        for middleware in self.middlewares:
+            wait = max(wait, middleware.prepare(request) or 0)
+        request.sent = time.monotonic() + wait
+        return wait
+
+    def retry_delay(self, request, error, attempt):
+        """Return seconds to wait before retrying a failed attempt, or None."""
+        delay = None
+        for middleware in self.middlewares:
+            middleware_delay = middleware.failed(request, error, attempt)
+            if delay is None:
+                delay = middleware_delay
+        if delay is not None:
+            logger.warning(
+                "Retrying in {delay:.2f}s | attempt {attempt} failed with {error} | url: {url}".format(
+                    delay=delay,
+                    attempt=attempt,
+                    error=type(error).__name__,
+                    url=request.url
+                )
+            )
+        return delay
+
+    def response(self, request, response):
+        """Return the data of a response, or the unread response of a successful stream request.
+
+        :raises APIError: if the response is an error.
+        """
+        data = None
+        for middleware in self.middlewares:
+            middleware_data = middleware.received(request, response)
+            if data is None:
+                data = middleware_data
+        if data is not None:
+            return data
+        if request.stream and response.status == 200:
+            return response.raw
+
+        try:
+            if request.is_json:
+                data = self.json_loads(response.body)
+            else:
+                data = response.text()
+        except ValueError:
+            data = response.text()
+            if response.status == 200:
+                raise APIError(status=response.status, message="Invalid JSON response")
+
+        if response.status != 200:
+            kwargs = error_kwargs(data, response.status)
+            logger.error(
+                "API Error | HTTP status {status} | {errmsg} | url: {url}".format(
+                    status=response.status,
+                    errmsg=kwargs['message'],
+                    url=request.url
+                )
+            )
+            raise APIClientResponseError(retry_after=retry_after(response.headers), **kwargs)
+
+        if isinstance(data, dict):
+            if data.get('error'):
+                raise APIError(**error_kwargs(data, response.status))
+
+        for middleware in self.middlewares:
+            middleware.completed(request, response, data)
+        return data
+
+
+class RequestsTransport:
+    """Blocking transport sending requests with a pooled requests.Session.
+
+    The session is thread-safe once created, so one transport can be
+    shared by multiple threads.
+    """
+
+    def __init__(self, session=None, pool_connections=10, pool_maxsize=10, pool_block=False):
+        """Init.
+
+        :param session: Optional requests.Session to use. It is not closed by the transport.
+        :param pool_connections: Number of host pools to cache.
+        :param pool_maxsize: Max number of connections kept in each pool.
+        :param pool_block: Block when no free connections are available instead of opening a new one.
+        """
+        self._session = session
+        self._owns_session = session is None
+        self._lock = threading.Lock()
+        self._adapter_kwargs = dict(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+
+    @property
+    def session(self):
+        """Return the shared requests session, creating it on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(**self._adapter_kwargs)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._owns_session = True
+        return self._session
+
+    def send(self, request, timeout):
+        """Send a request and return its Response."""
+        try:
+            r = self.session.get(request.url, headers=request.headers, timeout=timeout, stream=request.stream)
+            if request.stream and r.status_code == 200:
+                return Response(r.status_code, r.headers, None, r.encoding, raw=r)
+            try:
+                body = r.content
+            finally:
+                if request.stream:
+                    r.close()
+        except Timeout as e:
+            raise APITimeoutError(message=str(e))
+        except ConnectionError as e:
+            raise APIConnectionError(message=str(e))
+        except RequestException as e:
+            raise APIError(message=str(e))
+        return Response(r.status_code, r.headers, body, r.encoding)
+
+    def close(self):
+        """Close the session if it is owned by the transport."""
+        with self._lock:
+            if self._owns_session and self._session is not None:
+                self._session.close()
+            self._session = None
+
+
+class AiohttpTransport:
+    """Asyncio transport sending requests with a pooled aiohttp.ClientSession."""
+
+    def __init__(self, session=None, limit=100, limit_per_host=0, keepalive_timeout=30, ttl_dns_cache=300):
+        """Init.
+
+        :param session: Optional aiohttp.ClientSession to use. It is not closed by the transport.
+        :param limit: Max number of simultaneous connections.
+        :param limit_per_host: Max number of simultaneous connections per host. 0 for no limit.
+        :param keepalive_timeout: Seconds an idle connection is kept alive.
+        :param ttl_dns_cache: Seconds resolved DNS entries are cached.
+        """
+        self._session = session
+        self._owns_session = session is None
+        self._loop = None
+        self._connector_kwargs = dict(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache,
+        )
+
+    @property
+    def session(self):
+        """Return the shared aiohttp session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(**self._connector_kwargs)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+            self._loop = asyncio.get_event_loop()
+        return self._session
+
+    async def _get_session(self):
+        """Return the session, replacing an owned session created on another event loop.
+
+        A session is bound to the loop it was created on, so a client
+        reused across asyncio.run() calls needs a new one on each loop.
+        """
+        session = self._session
+        if session is not None and self._owns_session and self._loop is not asyncio.get_event_loop():
+            self._session = None
+            if not session.closed:
+                # The connections of a closed loop cannot be closed gracefully,
+                # this only marks the session closed.
+                await session.close()
+        return self.session
+
+    async def send(self, request, timeout):
+        """Send a request and return its Response."""
+        try:
+            if request.stream:
+                # No total timeout: large bodies may take long to stream.
+                client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+                session = await self._get_session()
+                resp = await session.get(request.url, headers=request.headers, timeout=client_timeout)
+                if resp.status == 200:
+                    return Response(resp.status, resp.headers, None, resp.charset, raw=resp)
+                try:
+                    body = await resp.read()
+                finally:
+                    resp.release()
+            else:
+                client_timeout = aiohttp.ClientTimeout(total=timeout)
+                session = await self._get_session()
+                async with session.get(request.url, headers=request.headers, timeout=client_timeout) as resp:
+                    body = await resp.read()
+        except asyncio.TimeoutError as e:
+            raise APITimeoutError(message=str(e) or "Request timed out")
+        except aiohttp.ClientConnectionError as e:
+            raise APIConnectionError(message=str(e))
+        except aiohttp.ClientError as e:
+            raise APIError(message=str(e))
+        return Response(resp.status, resp.headers, body, resp.charset)
+
+    async def close(self):
+        """Close the session if it is owned by the transport."""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,104 @@
+"""
+Client-side rate limiting.
+"""
+import asyncio
+import threading
+import time
+
+
+def _header_float(headers, name):
+    """Return header value as float, or None if missing or invalid."""
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Token bucket rate limiter.
+
+    Tokens are added at ``rate`` per second up to ``burst``. Each request
+    takes one token and waits for it if the bucket is empty. Waiting
+    requests reserve their tokens in order, so they are served first come
+    first served.
+
+    A limiter is thread-safe and can be shared by several Client and
+    AsyncClient instances in the same process. Use :meth:`acquire` from
+    blocking code and :meth:`acquire_async` from coroutines.
+
+    The limiter also follows the rate limit headers of responses: it
+    drains the bucket to ``X-RateLimit-Remaining`` and pauses until
+    ``X-RateLimit-Reset`` or ``Retry-After`` when the server asks it to.
+    """
+
+    def __init__(self, rate=5.0, burst=None):
+        """Init.
+
+        :param rate: Requests per second.
+        :param burst: Max requests sent back to back. Defaults to rate.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive.")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds):
+        """Stop handing out tokens for the given number of seconds."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Adjust to the rate limit headers of a response."""
+        retry_after = _header_float(headers, 'Retry-After')
+        if retry_after is not None:
+            self.block_for(retry_after)
+
+        remaining = _header_float(headers, 'X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, remaining)
+        if remaining <= 0:
+            reset = _header_float(headers, 'X-RateLimit-Reset')
+            if reset is None:
+                self.block_for(1 / self.rate)
+            elif reset > 1e9:
+                # Epoch timestamp
+                self.block_for(max(0.0, reset - time.time()))
+            else:
+                self.block_for(reset)
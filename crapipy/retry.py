@@ -0,0 +1,65 @@
+"""
+Retry policy for failed requests.
+"""
+import random
+
+from .exceptions import APIClientResponseError, APIConnectionError, APITimeoutError
+
+
+class RetryPolicy:
+    """Decide whether and when to retry a failed request.
+
+    Timeouts, connection errors and responses with a status in
+    ``retry_statuses`` are retried up to ``max_attempts`` attempts in
+    total. Delays grow exponentially from ``backoff`` up to ``max_backoff``
+    seconds with full jitter. A ``Retry-After`` header sent by the server
+    takes precedence over the computed delay and is not capped by
+    ``max_backoff``; if it asks to wait more than ``max_retry_after``
+    seconds the request is not retried.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 retry_statuses=(429, 500, 502, 503, 504), retry_timeouts=True, retry_connection_errors=True,
+                 max_retry_after=300.0):
+        """Init.
+
+        :param max_attempts: Max number of attempts including the first one.
+        :param backoff: Delay in seconds before the first retry.
+        :param max_backoff: Max delay in seconds between attempts.
+        :param jitter: Randomize delays between 0 and the computed delay.
+        :param retry_statuses: HTTP statuses which are retried.
+        :param retry_timeouts: Retry requests which timed out.
+        :param retry_connection_errors: Retry requests which failed to connect.
+        :param max_retry_after: Max Retry-After in seconds to wait for. None for no limit.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_timeouts = retry_timeouts
+        self.retry_connection_errors = retry_connection_errors
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, error, attempt):
+        """Return True if a request which failed with error on attempt should be retried."""
+        if attempt >= self.max_attempts:
+            return False
+        if isinstance(error, APITimeoutError):
+            return self.retry_timeouts
+        if isinstance(error, APIConnectionError):
+            return self.retry_connection_errors
+        if isinstance(error, APIClientResponseError):
+            return error.status in self.retry_statuses
+        return False
+
+    def delay(self, attempt, retry_after=None):
+        """Return seconds to wait before the attempt following attempt, or None to give up."""
+        if retry_after is not None:
+            if self.max_retry_after is not None and retry_after > self.max_retry_after:
+                return None
+            return max(retry_after, 0.0)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
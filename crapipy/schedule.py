@@ -0,0 +1,161 @@
+"""
+Poll schedulers.
+"""
+import heapq
+import time
+
+
+class Scheduler:
+    """Deadlines of keys polled at a fixed interval each.
+
+    Deadlines are kept in a heap, so the keys which are due are popped in
+    deadline order. A popped key is not due again until :meth:`done`
+    schedules its next poll.
+    """
+
+    def __init__(self, interval=60):
+        """Init.
+
+        :param interval: Default seconds between two polls of a key.
+        """
+        self.default_interval = interval
+        self.intervals = {}
+        # Heap of (deadline, key). Entries which are not the next deadline
+        # of a scheduled key are skipped.
+        self._deadlines = []
+        self._next = {}
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, key):
+        return key in self.intervals
+
+    def add(self, key, interval=None):
+        """Schedule a key, due now if it is new.
+
+        :param interval: Seconds between two polls. Defaults to the scheduler interval.
+        """
+        self.intervals[key] = interval if interval is not None else self.default_interval
+        if key not in self._next:
+            self._push(key, time.monotonic())
+
+    def remove(self, key):
+        """Stop scheduling a key."""
+        self.intervals.pop(key, None)
+        self._next.pop(key, None)
+
+    def _push(self, key, deadline):
+        self._next[key] = deadline
+        heapq.heappush(self._deadlines, (deadline, key))
+
+    def _drop_stale(self):
+        deadlines = self._deadlines
+        while deadlines and self._next.get(deadlines[0][1]) != deadlines[0][0]:
+            heapq.heappop(deadlines)
+
+    def next_deadline(self):
+        """Return seconds until the next key is due, or None if no key is waiting."""
+        self._drop_stale()
+        if not self._deadlines:
+            return None
+        return max(0.0, self._deadlines[0][0] - time.monotonic())
+
+    def pop_due(self, limit=None):
+        """Return the keys which are due, earliest deadline first.
+
+        :param limit: Max number of keys.
+        """
+        now = time.monotonic()
+        due = []
+        while limit is None or len(due) < limit:
+            self._drop_stale()
+            if not self._deadlines or self._deadlines[0][0] > now:
+                break
+            _, key = heapq.heappop(self._deadlines)
+            del self._next[key]
+            due.append(key)
+        return due
+
+    def done(self, key, changed=None):
+        """Schedule the next poll of a polled key.
+
+        :param changed: True if the poll found changes, False if not, None if unknown.
+        """
+        interval = self.intervals.get(key)
+        if interval is not None and key not in self._next:
+            self._push(key, time.monotonic() + interval)
+
+    def requeue(self, key, delay=None):
+        """Schedule again a popped key whose poll failed or did not happen.
+
+        Unlike :meth:`done`, the poll is not counted as an observation of the key.
+
+        :param delay: Seconds until the key is due. Defaults to the interval of the key.
+        """
+        interval = self.intervals.get(key)
+        if interval is not None and key not in self._next:
+            self._push(key, time.monotonic() + (interval if delay is None else delay))
+
+
+class AdaptiveScheduler(Scheduler):
+    """Scheduler deriving the interval of each key from how often it changes.
+
+    Each poll of a key is an observation of its change rate: one change
+    since the previous poll if the poll found changes, none otherwise.
+    ``change_rates`` keeps an exponentially smoothed estimate of the
+    changes per second of each key, and the interval of the key is set so
+    that a poll finds ``target`` changes on average, within
+    ``min_interval`` and ``max_interval``. Keys which change often are
+    polled often and idle keys rarely, which gives more fresh data per
+    request than a fixed interval.
+    """
+
+    def __init__(self, min_interval=30, max_interval=3600, interval=None, target=0.5, smoothing=0.2):
+        """Init.
+
+        :param min_interval: Min seconds between two polls of a key.
+        :param max_interval: Max seconds between two polls of a key.
+        :param interval: Starting interval of new keys. Defaults to min_interval.
+        :param target: Average number of changes a poll should find.
+        :param smoothing: Weight of the last poll in the change rate of a key.
+        """
+        if min_interval > max_interval:
+            raise ValueError("min_interval must not be greater than max_interval.")
+        if target <= 0:
+            raise ValueError("target must be positive.")
+        super().__init__(interval if interval is not None else min_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target = target
+        self.smoothing = smoothing
+        self.change_rates = {}
+        self._polled = {}
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def add(self, key, interval=None):
+        interval = self._clamp(interval if interval is not None else self.default_interval)
+        super().add(key, interval)
+        if key not in self.change_rates:
+            # The rate at which the starting interval is the right one.
+            self.change_rates[key] = self.target / interval if interval > 0 else float('inf')
+
+    def remove(self, key):
+        super().remove(key)
+        self.change_rates.pop(key, None)
+        self._polled.pop(key, None)
+
+    def done(self, key, changed=None):
+        if key in self.intervals:
+            now = time.monotonic()
+            last = self._polled.get(key)
+            if changed is not None and last is not None and now > last:
+                observed = (1.0 if changed else 0.0) / (now - last)
+                rate = self.change_rates[key]
+                rate += self.smoothing * (observed - rate)
+                self.change_rates[key] = rate
+                self.intervals[key] = self._clamp(self.target / rate if rate > 0 else self.max_interval)
+            self._polled[key] = now
+        super().done(key, changed)
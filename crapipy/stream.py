@@ -0,0 +1,126 @@
+"""
+Incremental parsing of JSON array responses.
+"""
+import json
+import re
+
+# Characters which change nesting outside of strings.
+_structure_re = re.compile(rb'[\[\]{}",]')
+# Characters which end a string or escape the next character.
+_string_re = re.compile(rb'["\\]')
+_non_space_re = re.compile(rb'\S')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class JSONArrayParser:
+    """Incremental parser of a JSON array.
+
+    Feed the response body as it arrives: :meth:`feed` returns the items of
+    the top level array completed so far and only keeps the bytes of the
+    current item. Each item is decoded on its own with ``loads``.
+
+    A document which is not an array, such as the single object returned
+    for one tag or an error, is kept whole and decoded by :meth:`close`.
+    """
+
+    def __init__(self, loads=json.loads):
+        """Init.
+
+        :param loads: Function decoding one JSON document from bytes.
+        """
+        self.loads = loads
+        self.is_array = None
+        self._buffer = bytearray()
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self._in_string = False
+        self._done = False
+
+    def feed(self, data):
+        """Add bytes of the document and return the list of completed items."""
+        if self._done:
+            return []
+        buffer = self._buffer
+        buffer += data
+        if self.is_array is None:
+            match = _non_space_re.search(buffer)
+            if match is None:
+                return []
+            self.is_array = buffer[match.start()] == ord('[')
+            self._pos = self._start = match.end()
+            self._depth = 1
+        if not self.is_array:
+            return []
+
+        items = []
+        pos = self._pos
+        while True:
+            if self._in_string:
+                match = _string_re.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == ord('\\'):
+                    if match.end() >= len(buffer):
+                        # Wait for the escaped character.
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _structure_re.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char = buffer[match.start()]
+            pos = match.end()
+            if char == ord('"'):
+                self._in_string = True
+            elif char in b'[{':
+                self._depth += 1
+            elif char in b']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(items, match.start())
+                    self._done = True
+                    break
+            elif self._depth == 1:
+                # Comma between two items of the array
+                self._emit(items, match.start())
+                self._start = pos
+
+        # Drop the bytes of the items already returned.
+        if self._done:
+            del buffer[:]
+            pos = self._start = 0
+        elif self._start:
+            del buffer[:self._start]
+            pos -= self._start
+            self._start = 0
+        self._pos = pos
+        return items
+
+    def _emit(self, items, end):
+        data = bytes(self._buffer[self._start:end]).strip()
+        if data:
+            items.append(self.loads(data))
+
+    def close(self):
+        """Finish the document and return the list of remaining items.
+
+        :raises ValueError: if the document is empty, invalid or truncated.
+        """
+        if self.is_array is None:
+            raise ValueError("Empty JSON document")
+        if not self.is_array:
+            data = bytes(self._buffer)
+            del self._buffer[:]
+            return [self.loads(data)]
+        if not self._done:
+            raise ValueError("Truncated JSON array")
+        return []
@@ -13,3 +13,16 @@ class APIURL:
     popular_players = 'http://api.cr-api.com/popular/players'
     popular_clans = 'http://api.cr-api.com/popular/clans'
     popular_tournaments = 'http://api.cr-api.com/popular/tournaments'
+
+    @classmethod
+    def endpoint_name(cls, url):
+        """Return name of the endpoint url belongs to, or None if unknown."""
+        match = None
+        for name, template in vars(cls).items():
+            if not isinstance(template, str) or name.startswith('_'):
+                continue
+            prefix = template.split('{')[0]
+            if url == template or (prefix != template and url.startswith(prefix)):
+                if match is None or len(prefix) > len(match[1]):
+                    match = (name, prefix)
+        return match[0] if match else None
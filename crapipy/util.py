@@ -1,9 +1,32 @@
 """
 Utility functions
 """
+import json
+import re
+import sys
 
 from box import Box, BoxList
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_first_cap_re = re.compile('(.)([A-Z][a-z]+)')
+_all_cap_re = re.compile('([a-z0-9])([A-Z])')
+
+# Process-wide camelCase key to snake_case key table, shared by all models.
+# It is pre-seeded with the known API keys and filled as new keys are seen,
+# up to MAX_SNAKE_KEYS entries.
+_snake_keys = {}
+MAX_SNAKE_KEYS = 10000
+
+
 def make_box(data):
     """Create Box instance from dict."""
     return Box(data, camel_killer_box=True)
@@ -11,3 +34,79 @@ def make_box(data):
 def make_box_list(data):
     """Create BoxList instance from dict."""
     return BoxList(data, camel_killer_box=True)
+
+
+def camel_to_snake(key):
+    """Convert camelCase key to snake_case the same way Box does.
+
+    arenaID -> arena_id, clanChestCrowns -> clan_chest_crowns
+    """
+    s1 = _first_cap_re.sub(r'\1_\2', str(key))
+    s2 = _all_cap_re.sub(r'\1_\2', s1)
+    return re.sub(' *_+', '_', s2.lower())
+
+
+def snake_key(key):
+    """Return snake_case version of key, memoized per key string."""
+    try:
+        return _snake_keys[key]
+    except KeyError:
+        snake = camel_to_snake(key)
+        if len(_snake_keys) < MAX_SNAKE_KEYS:
+            _snake_keys[sys.intern(key) if type(key) is str else key] = sys.intern(snake)
+        return snake
+
+
+def seed_snake_keys(keys):
+    """Add keys to the shared snake_case conversion table."""
+    for key in keys:
+        snake_key(key)
+
+
+def error_kwargs(data, status=None):
+    """Return APIError keyword arguments from a decoded error response."""
+    if not isinstance(data, dict):
+        return dict(error=True, status=status, message=data if isinstance(data, str) else None)
+    return dict(
+        error=data.get('error', True),
+        status=data.get('status', status),
+        message=data.get('message'),
+    )
+
+
+def retry_after(headers):
+    """Return Retry-After header in seconds, or None."""
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _stdlib_loads(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def get_decoder(name=None):
+    """Return a function decoding JSON from bytes or str.
+
+    :param name: 'orjson', 'ujson' or 'json'. If None, the fastest
+                 installed decoder is used, falling back to the stdlib.
+    """
+    if name is None:
+        name = 'orjson' if orjson is not None else 'ujson' if ujson is not None else 'json'
+    if name == 'orjson':
+        if orjson is None:
+            raise ImportError("orjson is not installed.")
+        return orjson.loads
+    if name == 'ujson':
+        if ujson is None:
+            raise ImportError("ujson is not installed.")
+        return ujson.loads
+    if name == 'json':
+        return _stdlib_loads
+    raise ValueError("Unknown JSON decoder: {}".format(name))
@@ -0,0 +1,274 @@
+"""
+Change feed of watched clans and players.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from .bulk import MAX_TAGS_PER_REQUEST, chunked
+from .client import RawModels
+from .crawler import CLAN, PLAYER
+from .models import Tag
+from .schedule import Scheduler
+from .url import APIURL
+
+logger = logging.getLogger(__name__)
+
+CHANGED = 'changed'
+ADDED = 'added'
+REMOVED = 'removed'
+
+# Fields identifying the items of a list, e.g. the members of a clan.
+ITEM_KEYS = ('tag', 'key')
+
+
+class Change:
+    """Change of a watched clan or player between two snapshots.
+
+    ``type`` is CHANGED for a field whose value changed, or ADDED / REMOVED
+    for an item of a list, such as a clan member, which joined or left.
+    ``path`` is the tuple of keys leading to the field or list, with the
+    item key for the fields of list items, e.g.
+    ``('members', 'Q8JGYLCY', 'donations')``.
+    """
+
+    __slots__ = ('kind', 'tag', 'type', 'path', 'old', 'new')
+
+    def __init__(self, kind, tag, type, path, old=None, new=None):
+        self.kind = kind
+        self.tag = tag
+        self.type = type
+        self.path = path
+        self.old = old
+        self.new = new
+
+    @property
+    def field(self):
+        """Return path as a dotted str."""
+        return '.'.join(str(p) for p in self.path)
+
+    def __eq__(self, other):
+        if not isinstance(other, Change):
+            return NotImplemented
+        return all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self):
+        if self.type == CHANGED:
+            return "<Change {} {} {}: {!r} -> {!r}>".format(self.kind, self.tag, self.field, self.old, self.new)
+        return "<Change {} {} {} {}>".format(self.kind, self.tag, self.type, self.field)
+
+
+def _item_key(items):
+    """Return the field identifying the dict items of a list, or None."""
+    for key in ITEM_KEYS:
+        if all(isinstance(item, dict) and key in item for item in items):
+            return key
+    return None
+
+
+def diff(old, new, path=(), ignore=frozenset()):
+    """Yield (type, path, old, new) for each difference of two decoded JSON values.
+
+    Equal subtrees are skipped with a single comparison. Lists of objects
+    with a tag or key are compared item by item; other lists are compared
+    as a whole.
+
+    :param ignore: Field names to leave out, e.g. {'rank', 'previousRank'}.
+    """
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key in ignore:
+                continue
+            if key in new:
+                yield from diff(old[key], new[key], path + (key,), ignore)
+            else:
+                yield CHANGED, path + (key,), old[key], None
+        for key in new:
+            if key not in old and key not in ignore:
+                yield CHANGED, path + (key,), None, new[key]
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        key = _item_key(old + new)
+        if key is not None:
+            old_items = {item[key]: item for item in old}
+            new_items = {item[key]: item for item in new}
+            for item_key, item in old_items.items():
+                if item_key not in new_items:
+                    yield REMOVED, path, item, None
+                else:
+                    yield from diff(item, new_items[item_key], path + (item_key,), ignore)
+            for item_key, item in new_items.items():
+                if item_key not in old_items:
+                    yield ADDED, path, None, item
+            return
+    yield CHANGED, path, old, new
+
+
+class Watcher:
+    """Poll clans and players and report what changed.
+
+    The watcher keeps the last response of each watched tag. Each poll
+    fetches the tags which are due, in multi-tag requests of up to
+    ``batch_size`` tags, and returns a :class:`Change` for every difference
+    with the previous snapshot. The first poll of a tag only stores its
+    snapshot. Polls skip the response cache of the client, so that they
+    always get fresh data. When tags are due is decided by a :class:`crapipy.schedule.Scheduler`;
+    pass an :class:`crapipy.schedule.AdaptiveScheduler` to poll tags which
+    change often more often than idle ones.
+
+    Works with a :class:`crapipy.Client`:
+
+        watcher = Watcher(client, interval=60, ignore={'rank', 'previousRank'})
+        watcher.watch_clan('2CCCP')
+        for change in watcher:
+            print(change)
+
+    or a :class:`crapipy.AsyncClient`, with ``await watcher.poll_async()`` or
+    ``async for change in watcher``.
+    """
+
+    def __init__(self, client, interval=60, ignore=(), batch_size=MAX_TAGS_PER_REQUEST, scheduler=None,
+                 concurrency=4):
+        """Init.
+
+        :param client: Client or AsyncClient.
+        :param interval: Default seconds between two polls of a tag.
+        :param ignore: Field names whose changes are not reported.
+        :param batch_size: Max tags per request.
+        :param scheduler: Scheduler of the polls, e.g. an AdaptiveScheduler. Defaults to a
+                          Scheduler with a fixed interval.
+        :param concurrency: Max number of requests in flight with an AsyncClient.
+        """
+        self.client = client
+        self.ignore = frozenset(ignore)
+        self.batch_size = batch_size
+        self.scheduler = scheduler if scheduler is not None else Scheduler(interval)
+        self.concurrency = concurrency
+        self.snapshots = {}
+        self._events = deque()
+
+    def __len__(self):
+        """Return number of watched tags."""
+        return len(self.scheduler)
+
+    def watch(self, kind, tag, interval=None):
+        """Watch a clan or player.
+
+        :param kind: CLAN or PLAYER.
+        :param interval: Seconds between two polls. Defaults to the scheduler interval.
+        """
+        self.scheduler.add((kind, Tag.normalize(tag)), interval)
+
+    def watch_clan(self, tag, interval=None):
+        """Watch a clan."""
+        self.watch(CLAN, tag, interval)
+
+    def watch_player(self, tag, interval=None):
+        """Watch a player."""
+        self.watch(PLAYER, tag, interval)
+
+    def unwatch(self, kind, tag):
+        """Stop watching a clan or player."""
+        key = (kind, Tag.normalize(tag))
+        self.scheduler.remove(key)
+        self.snapshots.pop(key, None)
+
+    def update(self, kind, tag, data):
+        """Store a new snapshot of a tag and return the list of changes."""
+        key = (kind, Tag.normalize(tag))
+        old = self.snapshots.get(key)
+        self.snapshots[key] = data
+        if old is None:
+            return []
+        return [Change(kind, key[1], type, path, o, n) for type, path, o, n in diff(old, data, (), self.ignore)]
+
+    def next_poll(self):
+        """Return seconds until the next tag is due, or None if nothing is watched."""
+        return self.scheduler.next_deadline()
+
+    def _requests(self):
+        """Return list of (kind, url, tags) fetching the tags which are due."""
+        due = {CLAN: [], PLAYER: []}
+        for kind, tag in self.scheduler.pop_due():
+            due[kind].append(tag)
+        requests = []
+        for kind, tags in due.items():
+            url = APIURL.clan if kind == CLAN else APIURL.player
+            requests.extend((kind, url, chunk) for chunk in chunked(tags, self.batch_size))
+        return requests
+
+    def _changes(self, kind, results):
+        """Return changes of fetched results and schedule the next polls."""
+        changes = []
+        for tag, data in results.items():
+            key = (kind, tag)
+            if isinstance(data, Exception):
+                logger.warning("Watcher failed to fetch {} {}: {}".format(kind, tag, data))
+                self.scheduler.requeue(key)
+            elif key in self.scheduler:
+                first = key not in self.snapshots
+                tag_changes = self.update(kind, tag, data)
+                changes.extend(tag_changes)
+                self.scheduler.done(key, None if first else bool(tag_changes))
+        return changes
+
+    def _reschedule(self, requests):
+        """Schedule the next polls of tags whose results were not handled, e.g. after an error."""
+        for kind, _, tags in requests:
+            for tag in tags:
+                self.scheduler.requeue((kind, tag))
+
+    def poll(self):
+        """Fetch the tags which are due and return the list of changes."""
+        requests = self._requests()
+        changes = []
+        try:
+            for kind, url, tags in requests:
+                changes.extend(self._changes(kind, self.client._fetch_chunk(url, tags, RawModels.Clan, cache=False)))
+        finally:
+            self._reschedule(requests)
+        return changes
+
+    async def poll_async(self):
+        """Fetch the tags which are due and return the list of changes."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(kind, url, tags):
+            async with semaphore:
+                return self._changes(kind, await self.client._fetch_chunk(url, tags, RawModels.Clan, cache=False))
+
+        requests = self._requests()
+        tasks = [asyncio.ensure_future(fetch(*request)) for request in requests]
+        changes = []
+        try:
+            for chunk_changes in await asyncio.gather(*tasks):
+                changes.extend(chunk_changes)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._reschedule(requests)
+        return changes
+
+    def __iter__(self):
+        """Poll forever, or until nothing is watched, and yield changes."""
+        while True:
+            wait = self.next_poll()
+            if wait is None:
+                return
+            time.sleep(wait)
+            yield from self.poll()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._events:
+            wait = self.next_poll()
+            if wait is None:
+                raise StopAsyncIteration
+            await asyncio.sleep(wait)
+            self._events.extend(await self.poll_async())
+        return self._events.popleft()
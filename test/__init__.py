@@ -0,0 +1,97 @@
+"""
+Helpers shared by the tests.
+"""
+import asyncio
+import json
+import os
+
+from crapipy.pipeline import Response
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def load_data(filename):
+    """Return the decoded JSON of a file of test/data."""
+    with open(os.path.join(DATA_DIR, filename)) as f:
+        return json.load(f)
+
+
+def load_body(filename):
+    """Return the bytes of a file of test/data."""
+    with open(os.path.join(DATA_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def json_response(data, status=200, headers=None):
+    """Return a transport Response with data as JSON body."""
+    return Response(status, headers or {}, json.dumps(data).encode())
+
+
+def error_response(status, message='Error', headers=None):
+    """Return a transport Response with an API error body."""
+    return json_response(dict(error=True, status=status, message=message), status, headers)
+
+
+def url_tags(url):
+    """Return the tags of a multi-tag URL."""
+    return url.rstrip('/').split('/')[-1].split(',')
+
+
+class Transport:
+    """Client transport answering requests locally.
+
+    Requests go through the whole pipeline of the client, only the sending
+    is replaced.
+    """
+
+    def __init__(self, answer):
+        """Init.
+
+        :param answer: Function of a Request returning a Response, or raising an
+                       APIError like a transport does, or a list of Responses
+                       and APIErrors used in order.
+        """
+        if isinstance(answer, list):
+            answers = list(answer)
+            answer = lambda request: self._pop(answers)
+        self.answer = answer
+        self.requests = []
+        self.closed = False
+
+    @staticmethod
+    def _pop(answers):
+        response = answers.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    @property
+    def urls(self):
+        """Return URLs of the requests sent."""
+        return [request.url for request in self.requests]
+
+    def _send(self, request):
+        self.requests.append(request)
+        return self.answer(request)
+
+    def send(self, request, timeout):
+        return self._send(request)
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncTransport(Transport):
+    """Transport of an AsyncClient, answering after delay seconds."""
+
+    def __init__(self, answer, delay=0):
+        super().__init__(answer)
+        self.delay = delay
+
+    async def send(self, request, timeout):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._send(request)
+
+    async def close(self):
+        self.closed = True
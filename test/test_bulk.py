@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from crapipy import APIClientResponseError, APIError, APITimeoutError, AsyncClient, Client, Player
+from crapipy.bulk import TagBatcher, bulk_results, chunked, map_chunk, should_split, unique_tags
+
+from . import AsyncTransport, Transport, error_response, json_response, load_data, url_tags
+
+
+def test_chunked():
+    assert chunked([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert chunked([], 2) == []
+    with pytest.raises(ValueError):
+        chunked([1], 0)
+
+
+def test_unique_tags():
+    assert unique_tags(['#c0g20pr2', 'C0G20PR2', '8L9L9GL']) == ['C0G20PR2', '8L9L9GL']
+
+
+def test_map_chunk():
+    data = load_data('player_L88P2282,9CQ2U8QJ,8L9L9GL.json')
+    results = map_chunk(['8L9L9GL', 'L88P2282', 'PY9VC98C'], data, Player)
+    assert results['L88P2282'].tag == 'L88P2282'
+    assert isinstance(results['PY9VC98C'], APIError)
+
+
+def test_should_split():
+    assert should_split(APIClientResponseError(status=404))
+    assert should_split(APIClientResponseError(status=400))
+    assert not should_split(APIClientResponseError(status=429))
+    assert not should_split(APIClientResponseError(status=503))
+    assert not should_split(APITimeoutError())
+    assert not should_split(APIError(status=404))
+
+
+def test_fetch_chunk_not_split():
+    transport = Transport(lambda request: error_response(429))
+    client = Client(transport=transport, retry=None)
+    results = client._fetch_chunk('http://a/{}', ['2P', '2Q', '2R'], Player)
+    assert len(transport.requests) == 1
+    assert all(results[tag].status == 429 for tag in ('2P', '2Q', '2R'))
+
+    transport = Transport(lambda request: error_response(404))
+    client = Client(transport=transport, retry=None)
+    client._fetch_chunk('http://a/{}', ['2P', '2Q', '2R'], Player)
+    assert len(transport.requests) == 4
+
+
+def players_transport(transport_class):
+    return transport_class(lambda request: json_response([dict(tag=tag) for tag in url_tags(request.url)]))
+
+
+def test_get_players_bulk_generator():
+    client = Client(transport=players_transport(Transport))
+    results = client.get_players_bulk(tag for tag in ['2P', '#2q', '2P'])
+    assert [r.tag for r in results] == ['2P', '2Q', '2P']
+    assert all(r.ok for r in results)
+
+
+@pytest.mark.asyncio
+async def test_async_get_players_bulk_generator():
+    client = AsyncClient(transport=players_transport(AsyncTransport))
+    results = await client.get_players_bulk(tag for tag in ['2P', '#2q', '2P'])
+    assert [r.tag for r in results] == ['2P', '2Q', '2P']
+
+
+def test_bulk_results_order():
+    data = load_data('player_L88P2282,9CQ2U8QJ,8L9L9GL.json')
+    tags = ['#8L9L9GL', 'PY9VC98C', 'L88P2282', '8L9L9GL']
+    results = bulk_results(tags, map_chunk(unique_tags(tags), data, Player))
+    assert [r.tag for r in results] == ['8L9L9GL', 'PY9VC98C', 'L88P2282', '8L9L9GL']
+    assert [r.ok for r in results] == [True, False, True, True]
+    assert results[2].result.tag == 'L88P2282'
+
+
+@pytest.mark.asyncio
+async def test_tag_batcher():
+    data = load_data('player_L88P2282,9CQ2U8QJ,8L9L9GL.json')
+    requests = []
+
+    async def fetch_chunk(tags):
+        requests.append(tags)
+        return map_chunk(tags, [d for d in data if d['tag'] in tags], Player)
+
+    batcher = TagBatcher(fetch_chunk, window=0.01, max_tags=2)
+    results = await asyncio.gather(
+        batcher.get('L88P2282'), batcher.get('8L9L9GL'), batcher.get('9CQ2U8QJ'), batcher.get('PY9VC98C'),
+        return_exceptions=True
+    )
+    assert requests == [['L88P2282', '8L9L9GL'], ['9CQ2U8QJ', 'PY9VC98C']]
+    assert [r.tag for r in results[:3]] == ['L88P2282', '8L9L9GL', '9CQ2U8QJ']
+    assert isinstance(results[3], APIError)
+
+
+@pytest.mark.asyncio
+async def test_tag_batcher_close():
+    data = load_data('player_L88P2282,9CQ2U8QJ,8L9L9GL.json')
+
+    fetched = []
+
+    async def fetch_chunk(tags):
+        await asyncio.sleep(0.01)
+        fetched.append(tags)
+        return map_chunk(tags, data, Player)
+
+    batcher = TagBatcher(fetch_chunk, window=10)
+    future = asyncio.ensure_future(batcher.get('L88P2282'))
+    await asyncio.sleep(0)
+    await batcher.close()
+    assert fetched == [['L88P2282']]
+    assert (await future).tag == 'L88P2282'
@@ -0,0 +1,130 @@
+import sqlite3
+import time
+
+from crapipy import APIURL, MemoryCache, SQLiteCache
+from crapipy.cache import conditional_headers, ttl_for, validator_entry, validator_key
+
+
+def test_endpoint_name():
+    assert APIURL.endpoint_name(APIURL.clan.format('2CCCP,2U2GGQJ')) == 'clan'
+    assert APIURL.endpoint_name(APIURL.top_clans.format('us')) == 'top_clans'
+    assert APIURL.endpoint_name(APIURL.constants) == 'constants'
+    assert APIURL.endpoint_name('http://example.com') is None
+
+
+def test_ttl_for():
+    assert ttl_for(APIURL.constants) > ttl_for(APIURL.player.format('C0G20PR2'))
+    assert ttl_for(APIURL.player.format('C0G20PR2'), {'player': 0}) == 0
+    assert ttl_for('http://example.com') == 0
+
+
+def test_memory_cache_hit_miss():
+    cache = MemoryCache()
+    assert cache.get('a') is None
+    cache.set('a', {'name': 'a'}, 60)
+    assert cache.get('a') == {'name': 'a'}
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_memory_cache_expiry():
+    cache = MemoryCache()
+    cache.set('a', 1, 0.01)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 60)
+    cache.get('a')
+    cache.set('c', 3, 60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_memory_cache_max_bytes():
+    cache = MemoryCache(max_bytes=10)
+    cache.set('a', 'aaaaaa', 60)
+    cache.set('b', 'bbbbbb', 60)
+    assert cache.get('a') is None
+    assert cache.size == 6
+
+
+def test_memory_cache_invalidate():
+    cache = MemoryCache()
+    url = APIURL.version
+    cache.set_response(url, '1.0', is_json=False)
+    cache.set_response(APIURL.constants, {})
+    assert cache.get_response(url, is_json=False) == '1.0'
+    cache.invalidate(url)
+    assert cache.get_response(url, is_json=False) is None
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_sqlite_cache(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    cache = SQLiteCache(path, max_entries=2)
+    assert cache.get('a') is None
+    cache.set('a', {'name': 'a'}, 60)
+    assert cache.get('a') == {'name': 'a'}
+    cache.set('b', [1, 2], 60)
+    cache.set('c', 'c', 60)
+    assert len(cache) == 2
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+
+    # A second instance sees the same entries.
+    other = SQLiteCache(path)
+    assert other.get('b') == [1, 2]
+    other.delete('b')
+    assert cache.get('b') is None
+
+
+def test_sqlite_cache_expiry_and_size(tmpdir):
+    cache = SQLiteCache(str(tmpdir.join('cache.db')), max_bytes=10)
+    cache.set('a', 'aaaa', 0.01)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    cache.set('b', 'bbbb', 60)
+    cache.set('c', 'cccc', 60)
+    assert cache.get('b') is None
+    assert cache.get('c') == 'cccc'
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_size_table(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    cache = SQLiteCache(path, max_entries=3, purge_interval=2)
+    cache.set('a', 'aaaa', 60)
+    cache.set('a', 'aa', 60)
+    cache.set('b', 'bbbb', 0.01)
+    time.sleep(0.02)
+    cache.set('c', 'cccc', 60)
+    cache.delete('c')
+    conn = sqlite3.connect(path)
+    # The expired entry was purged on the second write, the replaced one counted once.
+    assert conn.execute("SELECT entries, bytes FROM cache_size").fetchone() == \
+        conn.execute("SELECT COUNT(*), SUM(size) FROM cache").fetchone() == (1, 4)
+
+    # The table of a database created without it starts from its content.
+    conn.execute("DROP TABLE cache_size")
+    conn.commit()
+    assert len(SQLiteCache(path)) == 1
+    conn.close()
+
+
+def test_validators():
+    assert validator_entry({}, {'a': 1}) is None
+    entry = validator_entry({'ETag': '"abc"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}, {'a': 1})
+    assert entry['data'] == {'a': 1}
+    assert conditional_headers(entry) == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+    }
+    assert conditional_headers(validator_entry({'ETag': '"abc"'}, None)) == {'If-None-Match': '"abc"'}
+    assert validator_key(APIURL.constants) != APIURL.constants
@@ -5,10 +5,10 @@ from crapipy import AsyncClient, Client, APIError
 
 @pytest.mark.asyncio
 async def test_clan_async():
-    client = AsyncClient()
-    clan = await client.get_clan('2CCCP')
-    assert clan.name == 'Reddit Alpha'
-    assert clan.badge.name == 'A_Char_Rocket_02'
+    async with AsyncClient() as client:
+        clan = await client.get_clan('2CCCP')
+        assert clan.name == 'Reddit Alpha'
+        assert clan.badge.name == 'A_Char_Rocket_02'
 
 def test_clan():
     client = Client()
@@ -18,9 +18,9 @@ def test_clan():
 
 @pytest.mark.asyncio
 async def test_invalid_clan_async():
-    client = AsyncClient()
-    with pytest.raises(APIError):
-        clan = await client.get_clan('123445')
+    async with AsyncClient() as client:
+        with pytest.raises(APIError):
+            clan = await client.get_clan('123445')
 
 def test_invalid_clan():
     client = Client()
@@ -13,9 +13,9 @@ def assert_clans(clans):
 
 @pytest.mark.asyncio
 async def test_clans_async():
-    client = AsyncClient()
-    clans = await client.get_clans(['2CCCP', '2U2GGQJ'])
-    assert_clans(clans)
+    async with AsyncClient() as client:
+        clans = await client.get_clans(['2CCCP', '2U2GGQJ'])
+        assert_clans(clans)
 
 
 def test_clans():
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from crapipy import AsyncClient
+
+from . import AsyncTransport, json_response
+
+
+def counting_transport():
+    """Return transport answering each URL with itself, slowly enough for requests to overlap."""
+    return AsyncTransport(lambda request: json_response({'url': request.url}), delay=0.01)
+
+
+@pytest.mark.asyncio
+async def test_coalesce_same_url():
+    transport = counting_transport()
+    client = AsyncClient(transport=transport)
+    results = await asyncio.gather(*[client.fetch('http://a') for _ in range(10)])
+    assert len(transport.requests) == 1
+    assert client.coalesced_count == 9
+    assert all(r == {'url': 'http://a'} for r in results)
+    assert client._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_coalesce_different_urls():
+    transport = counting_transport()
+    client = AsyncClient(transport=transport)
+    await asyncio.gather(client.fetch('http://a'), client.fetch('http://b'))
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesce_disabled():
+    transport = counting_transport()
+    client = AsyncClient(transport=transport, coalesce=False)
+    await asyncio.gather(*[client.fetch('http://a') for _ in range(3)])
+    assert len(transport.requests) == 3
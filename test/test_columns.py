@@ -0,0 +1,101 @@
+import pytest
+
+from crapipy import ClanTable, PlayerTable, Players, Tag, Tournaments, columns, lazy
+from crapipy.client import MODEL_TYPES
+from crapipy.compact import Players as CompactPlayers
+
+from . import load_data
+
+
+def test_player_table():
+    data = load_data('top_players.json')
+    players = PlayerTable.from_json(data)
+    assert len(players) == len(data)
+    assert players['tag'][0] == Tag.encode(data[0]['tag'])
+    row = players.row(0)
+    assert row['tag'] == data[0]['tag']
+    assert row['name'] == data[0]['name']
+    assert row['trophies'] == data[0]['trophies']
+    assert row['exp_level'] == data[0]['expLevel']
+    assert row['clan_tag'] == data[0]['clan']['tag']
+    assert players.find('#' + data[3]['tag']) == 3
+    assert players.find('2CCCP') is None
+
+
+def test_table_from_models():
+    data = load_data('top_players.json')
+    players = PlayerTable.from_json(data)
+    for models in (Players(data), CompactPlayers(data)):
+        table = PlayerTable.from_json(models)
+        for name in players.columns:
+            assert list(table[name]) == list(players[name])
+
+
+def test_player_details_table():
+    players = PlayerTable.from_json(load_data('player_L88P2282,9CQ2U8QJ,8L9L9GL.json'))
+    assert players.row(0)['exp_level'] == 13
+    assert players.row(0)['arena_id'] > 0
+
+
+def test_filter_sort():
+    data = load_data('top_players.json')
+    players = PlayerTable.from_json(data)
+    top = players.filter([t > 6000 for t in players['trophies']]).sort('trophies')
+    trophies = sorted(p['trophies'] for p in data if p['trophies'] > 6000)
+    assert list(top['trophies']) == trophies
+    assert [row['trophies'] for row in top.rows()] == trophies
+    top = players.sort('trophies', reverse=True)
+    assert top.row(0)['tag'] == max(data, key=lambda p: p['trophies'])['tag']
+
+
+def test_join():
+    players = PlayerTable.from_json(load_data('top_players.json'))
+    clans = ClanTable.from_json(load_data('top_clans.json'))
+    joined = players.join(clans, on='clan_tag')
+    clan_names = {clan['tag']: clan['name'] for clan in load_data('top_clans.json')}
+    for row in joined.rows():
+        assert row['clan_name'] == clan_names.get(row['clan_tag'])
+        if row['clan_name'] is None:
+            assert row['clan_score'] == 0
+
+
+def test_to_columns():
+    data = load_data('top_players.json')
+    for players in (Players(data), CompactPlayers(data), lazy.Players(data)):
+        cols = players.to_columns(fields=('tag', 'trophies', 'clan_tag'))
+        assert list(cols) == ['tag', 'trophies', 'clan_tag']
+        assert cols['tag'] == [p['tag'] for p in data]
+        assert list(cols['trophies']) == [p['trophies'] for p in data]
+        assert cols['clan_tag'][0] == data[0]['clan']['tag']
+
+
+def test_lazy_to_columns_does_not_wrap():
+    players = lazy.Players(load_data('top_players.json'))
+    players.to_columns()
+    assert all(type(p) is dict for p in list.__iter__(players))
+
+
+def test_tournaments_to_columns():
+    data = load_data('popular_tournaments.json')
+    cols = Tournaments(data).to_columns()
+    assert cols['creator_tag'][0] == data[0]['creator']['tag']
+    assert list(cols['max_capacity']) == [t['maxCapacity'] for t in data]
+
+
+def test_columns_model_type():
+    data = load_data('top_clans.json')
+    clans = MODEL_TYPES['columns'].Clans(data)
+    assert isinstance(clans, ClanTable)
+    assert clans.row(0)['member_count'] == data[0]['memberCount']
+
+
+@pytest.mark.skipif(columns.pandas is None, reason="pandas not installed")
+def test_to_pandas():
+    df = Players(load_data('top_players.json')).to_pandas()
+    assert list(df.columns) == [name for name, _, _ in PlayerTable.fields]
+
+
+@pytest.mark.skipif(columns.pyarrow is None, reason="pyarrow not installed")
+def test_to_arrow():
+    table = Players(load_data('top_players.json')).to_arrow()
+    assert table.column_names == [name for name, _, _ in PlayerTable.fields]
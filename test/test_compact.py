@@ -0,0 +1,53 @@
+import pytest
+
+from crapipy import compact
+
+from . import load_data
+
+
+def test_player():
+    player = compact.Player(load_data('player_8L9L9GL.json'))
+    assert player.tag == '8L9L9GL'
+    assert player.arena.arena_id == 17
+    assert player.arena.trophy_limit == 5200
+    assert player.clan.name == 'Reddit Bravo'
+    assert player.clan.badge.name == 'A_Char_Rocket_02'
+    assert isinstance(player.current_deck, compact.Deck)
+    assert len(player.current_deck) == 8
+    assert player.current_deck.average_elixir > 0
+    assert player.cards[0].max_level is not None
+    assert player.stats['maxTrophies'] == 5724
+    assert player.previous_rank is None
+    assert not hasattr(player, '__dict__')
+    with pytest.raises(AttributeError):
+        player.not_a_field
+
+
+def test_extra_fields():
+    clans = compact.Clans(load_data('popular_clans.json'))
+    assert int(clans[0].popularity['hits']) > 0
+    assert clans[0].to_dict()['popularity'] == clans[0].extra['popularity']
+
+
+def test_clan():
+    clan = compact.Clan(load_data('clan_2CCCP.json'))
+    assert clan.name == 'Reddit Alpha'
+    assert clan.member_count == len(clan.members)
+    assert clan.location.is_country is True
+    assert clan.members[0].clan_chest_crowns is not None
+
+
+def test_tournament():
+    tournament = compact.Tournament(load_data('tournaments_20YU0VJ9.json'))
+    assert tournament.max_capacity == 100
+    assert tournament.creator.tag == 'YYPRL9CV'
+    assert tournament.members[0].score is not None
+
+
+def test_equality_and_to_dict():
+    data = load_data('top_players.json')
+    players = compact.Players(data)
+    assert len(players) == len(data)
+    assert players[0] == compact.Player(data[0])
+    assert players[0] != players[1]
+    assert players.to_list()[0]['exp_level'] == data[0]['expLevel']
@@ -0,0 +1,63 @@
+import pytest
+from box import BoxError
+
+from crapipy.models import Constants
+
+CONSTANTS = {
+    'cards': [
+        {'key': 'knight', 'cardKey': 'knight', 'name': 'Knight', 'id': 26000000, 'elixir': 3, 'rarity': 'Common'},
+        {'key': 'archers', 'cardKey': 'archers', 'name': 'Archers', 'id': 26000001, 'elixir': 3, 'rarity': 'Common'},
+        {'key': 'pekka', 'name': 'P.E.K.K.A', 'id': 26000004, 'elixir': 7, 'rarity': 'Epic'},
+    ],
+    'arenas': [
+        {'arena': 'Arena 1', 'name': 'Goblin Stadium', 'arenaID': 1},
+        {'arena': 'Arena 2', 'name': 'Bone Pit', 'arenaID': 2},
+    ],
+    'chests': [{'name': 'Silver', 'id': 19000000}, {'name': 'Gold', 'id': 19000001}],
+    'rarities': [{'name': 'Common'}, {'name': 'Epic'}],
+    'chestCycle': {'order': ['Silver', 'Silver', 'Gold', 'Silver']},
+}
+
+
+def test_get_card():
+    constants = Constants(CONSTANTS)
+    assert constants.get_card(key='archers').name == 'Archers'
+    assert constants.get_card(card_key='knight').key == 'knight'
+    assert constants.get_card(name='P.E.K.K.A').elixir == 7
+    assert constants.get_card(id=26000001).key == 'archers'
+    assert constants.get_card(key='missing', name='Knight').key == 'knight'
+    assert constants.get_card(key='missing') is None
+    assert constants.get_card() is None
+
+
+def test_get_other_lookups():
+    constants = Constants(CONSTANTS)
+    assert constants.get_arena(arena_id=2).name == 'Bone Pit'
+    assert constants.get_arena(arena='Arena 1').arena_id == 1
+    assert constants.get_chest(name='Gold').id == 19000001
+    assert constants.get_rarity(name='Epic').name == 'Epic'
+    assert constants.get_chest_by_index(6) == 'Gold'
+
+
+def test_constants_are_read_only():
+    constants = Constants(CONSTANTS)
+    with pytest.raises(BoxError):
+        constants.cards = []
+
+
+def test_upcoming_chests():
+    constants = Constants(CONSTANTS)
+    assert constants.get_upcoming_chests(2, 6) == ['Gold', 'Silver', 'Silver', 'Silver', 'Gold', 'Silver']
+    assert constants.get_upcoming_chests(5, 1) == ['Silver']
+    assert constants.get_upcoming_chests(0, 0) == []
+    assert constants.get_upcoming_chests(3, 9) == [constants.get_chest_by_index(i) for i in range(3, 12)]
+
+
+def test_chest_distances():
+    constants = Constants(CONSTANTS)
+    assert constants.get_chest_distances(0) == {'Silver': 0, 'Gold': 2}
+    assert constants.get_chest_distances(2) == {'Silver': 1, 'Gold': 0}
+    assert constants.get_chest_distances(7) == {'Silver': 0, 'Gold': 3}
+    distances = constants.get_chest_distances_many([0, 2, 7])
+    assert list(distances['Gold']) == [2, 0, 3]
+    assert list(distances['Silver']) == [0, 1, 0]
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from crapipy import AsyncClient
+from crapipy.crawler import CLAN, PLAYER, Crawler
+
+from . import AsyncTransport, json_response, load_data
+
+
+class GraphTransport(AsyncTransport):
+    """Transport answering clan 2CCCP and its members locally."""
+
+    def __init__(self):
+        super().__init__(self.graph)
+        self.clan = load_data('clan_2CCCP.json')
+
+    def graph(self, request):
+        kind, tags = request.url.rstrip('/').split('/')[-2:]
+        if kind == 'clan':
+            return json_response(self.clan)
+        return json_response([dict(tag=tag, name=tag, clan=dict(tag='2CCCP')) for tag in tags.split(',')])
+
+
+def graph_client():
+    return AsyncClient(transport=GraphTransport())
+
+
+@pytest.mark.asyncio
+async def test_crawl():
+    client = graph_client()
+    players = []
+    crawler = Crawler(client, on_player=lambda p: players.append(p.tag), concurrency=2)
+    crawler.add_clans(['#2cccp'])
+    await crawler.run()
+    assert len(players) == len(set(players)) == 46
+    assert len(client.transport.urls) == 3  # 1 clan request, 2 player requests of up to 25 tags
+    stats = crawler.stats()
+    assert stats['clans'] == 1
+    assert stats['players'] == 46
+    assert stats['frontier'] == 0
+    assert stats['items_per_second'] > 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_member_tag(tmpdir):
+    path = str(tmpdir.join('crawl.json'))
+    client = graph_client()
+    client.transport.clan['members'][0]['tag'] = '#XYZ'
+    players = []
+    crawler = Crawler(client, on_player=lambda p: players.append(p.tag), checkpoint=path)
+    crawler.add_clans(['2CCCP'])
+    await crawler.run()
+    assert len(players) == 45
+    assert crawler.errors == 1
+    assert len(Crawler(graph_client(), checkpoint=path)) == 0
+
+
+@pytest.mark.asyncio
+async def test_crawl_async_callback_and_depth():
+    client = graph_client()
+    clans = []
+
+    async def on_clan(clan):
+        clans.append(clan.tag)
+
+    crawler = Crawler(client, on_clan=on_clan, max_depth=0)
+    crawler.add_clans(['2CCCP'])
+    await crawler.run()
+    assert clans == ['2CCCP']
+    assert crawler.players == 0
+
+
+@pytest.mark.asyncio
+async def test_crawl_priority():
+    client = graph_client()
+    players = []
+    crawler = Crawler(
+        client, on_player=lambda p: players.append(p.tag), concurrency=1, batch_size=5, max_items=6,
+        priority=lambda kind, tag, depth, info: -info['trophies'] if info else 0
+    )
+    crawler.add_clans(['2CCCP'])
+    await crawler.run()
+    members = sorted(client.transport.clan['members'], key=lambda m: -m['trophies'])
+    assert players == [m['tag'] for m in members[:5]]
+    assert len(crawler) == 41
+
+
+@pytest.mark.asyncio
+async def test_checkpoint(tmpdir):
+    path = str(tmpdir.join('crawl.json'))
+    crawler = Crawler(graph_client(), concurrency=1, batch_size=10, max_items=11, checkpoint=path)
+    crawler.add_clans(['2CCCP'])
+    await crawler.run()
+    assert crawler.players == 10
+
+    resumed = Crawler(graph_client(), checkpoint=path)
+    assert len(resumed) == 36
+    assert resumed.players == 10
+    assert not resumed.add(PLAYER, 'Q8JGYLCY')
+    assert not resumed.add(CLAN, '2CCCP')
+    await resumed.run()
+    assert resumed.players == 46
+
+
+@pytest.mark.asyncio
+async def test_callback_error(tmpdir):
+    path = str(tmpdir.join('crawl.json'))
+    client = graph_client()
+    players = []
+
+    def on_player(player):
+        if len(players) == 7:
+            raise RuntimeError("callback failed")
+        players.append(player.tag)
+
+    crawler = Crawler(client, on_player=on_player, concurrency=2, batch_size=5, checkpoint=path)
+    crawler.add_clans(['2CCCP'])
+    with pytest.raises(RuntimeError):
+        await crawler.run()
+    requests = len(client.transport.urls)
+    await asyncio.sleep(0.05)
+    # No worker is left running.
+    assert len(client.transport.urls) == requests
+    assert crawler.players == 7
+
+    resumed = Crawler(graph_client(), on_player=lambda p: players.append(p.tag), checkpoint=path)
+    await resumed.run()
+    assert len(players) == len(set(players)) == 46
@@ -0,0 +1,35 @@
+import pytest
+
+from crapipy.util import get_decoder, orjson, ujson
+
+
+def test_stdlib_decoder():
+    loads = get_decoder('json')
+    assert loads(b'{"name": "\\u00e9"}') == {'name': 'é'}
+    assert loads('[1, 2]') == [1, 2]
+    with pytest.raises(ValueError):
+        loads(b'<html>')
+
+
+def test_default_decoder():
+    loads = get_decoder()
+    assert loads(b'{"tag": "C0G20PR2"}') == {'tag': 'C0G20PR2'}
+    with pytest.raises(ValueError):
+        loads(b'<html>')
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_decoder():
+    assert get_decoder() is orjson.loads
+    assert get_decoder('orjson')(b'[1]') == [1]
+
+
+@pytest.mark.skipif(ujson is not None, reason="ujson is installed")
+def test_missing_decoder():
+    with pytest.raises(ImportError):
+        get_decoder('ujson')
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError):
+        get_decoder('yaml')
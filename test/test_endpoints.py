@@ -9,9 +9,9 @@ def assert_endpoints(endpoints):
 
 @pytest.mark.asyncio
 async def test_endpoints_async():
-    client = AsyncClient()
-    endpoints = await client.get_endpoints()
-    assert_endpoints(endpoints)
+    async with AsyncClient() as client:
+        endpoints = await client.get_endpoints()
+        assert_endpoints(endpoints)
 
 
 def test_endpoints():
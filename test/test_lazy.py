@@ -0,0 +1,45 @@
+import json
+
+from crapipy import lazy
+
+from . import load_data
+
+
+def test_player():
+    data = load_data('player_8L9L9GL.json')
+    player = lazy.Player(data)
+    assert player.name == data['name']
+    assert player.arena.arena_id == player.arena.arenaID == player['arena']['arenaID'] == 17
+    assert player['arena']['arena_id'] == 17
+    assert player.clan.badge.name == 'A_Char_Rocket_02'
+    assert player.current_deck[0].max_level is not None
+    assert player.league_statistics.previous_season.best_trophies == 5260
+    assert player.get('not_a_field') is None
+
+
+def test_nested_values_are_wrapped_once():
+    player = lazy.Player(load_data('player_8L9L9GL.json'))
+    assert type(dict.__getitem__(player, 'arena')) is dict
+    arena = player.arena
+    assert isinstance(arena, lazy.LazyModel)
+    assert player.arena is arena
+
+
+def test_source_data_is_not_modified():
+    data = load_data('clan_2CCCP.json')
+    clan = lazy.Clan(data)
+    assert clan.members[0].arena.name is not None
+    assert type(data['members'][0]) is dict
+    assert type(data['members'][0]['arena']) is dict
+    assert clan == data
+    assert clan.to_dict() == data
+
+
+def test_lists():
+    data = load_data('clan_2CCCP,2U2GGQJ.json')
+    clans = lazy.Clans(data)
+    assert isinstance(clans[0], lazy.Clan)
+    assert [clan.name for clan in clans] == ['Reddit Alpha', 'Reddit Bravo']
+    assert isinstance(clans[:1], lazy.Clans)
+    assert clans[-1].members[0].clan_chest_crowns is not None
+    assert json.loads(clans.to_json()) == data
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from crapipy import APIError, Client
+
+from . import Transport, error_response, json_response, url_tags
+
+
+class ThreadedTransport(Transport):
+    """Transport answering player requests locally, slower for the first tags."""
+
+    def __init__(self):
+        super().__init__(self.players)
+        self.threads = set()
+
+    def players(self, request):
+        self.threads.add(threading.get_ident())
+        tags = url_tags(request.url)
+        if 'BAD' in tags:
+            return error_response(404, "Not found")
+        time.sleep(0.05 if tags[0] in ('2P', '2Q') else 0.01)
+        data = [dict(tag=tag, name=tag) for tag in tags]
+        return json_response(data[0] if len(data) == 1 else data)
+
+
+def threaded_client(**kwargs):
+    return Client(transport=ThreadedTransport(), **kwargs)
+
+
+def test_map_players_ordered():
+    with threaded_client(max_workers=4) as client:
+        tags = ['2P', '2Q', '#2r', '2U', '2P']
+        results = list(client.map_players(tags, ordered=True))
+        assert [r.tag for r in results] == ['2P', '2Q', '2R', '2U']
+        assert all(r.ok for r in results)
+        assert results[2].result.name == '2R'
+        assert len(client.transport.requests) == 4
+        assert len(client.transport.threads) > 1
+
+
+def test_map_players_as_completed():
+    with threaded_client(max_workers=4) as client:
+        results = list(client.map_players(['2P', '2Q', '2R', '2U']))
+        # The slow tags complete last
+        assert set(r.tag for r in results[2:]) == {'2P', '2Q'}
+
+
+def test_map_clans_errors():
+    with threaded_client() as client:
+        results = {r.tag: r for r in client.map_clans(['2R', 'BAD'], chunk_size=2, ordered=True)}
+        assert results['2R'].ok
+        assert isinstance(results['BAD'].error, APIError)
+        assert len(client.transport.requests) == 3
+
+
+def test_map_shared_executor():
+    client = threaded_client(max_workers=2)
+    list(client.map_players(['2R']))
+    executor = client.executor
+    list(client.map_players(['2U']))
+    assert client.executor is executor
+    client.close()
+    assert client._executor is None
@@ -0,0 +1,21 @@
+from crapipy import Player
+from crapipy.keys import API_KEYS
+from crapipy.util import camel_to_snake, snake_key
+
+from . import load_data
+
+
+def test_snake_key():
+    assert snake_key('arenaID') == 'arena_id'
+    assert snake_key('clanChestCrowns') == 'clan_chest_crowns'
+    assert snake_key('isCountry') == 'is_country'
+    for key in API_KEYS:
+        assert snake_key(key) == camel_to_snake(key)
+
+
+def test_player_model():
+    player = Player(load_data('player_8L9L9GL.json'))
+    assert player.arena.arena_id == player.arena.arenaID == 17
+    assert player['arena']['arenaID'] == 17
+    assert player.league_statistics.previous_season.best_trophies == 5260
+
@@ -0,0 +1,103 @@
+"""
+Test the request pipeline shared by Client and AsyncClient.
+"""
+import pytest
+
+from crapipy import AsyncClient, Client, MemoryCache, MetricsMiddleware, Middleware, RetryPolicy
+from crapipy.exceptions import APIClientResponseError
+
+from . import AsyncTransport, Transport, error_response, json_response
+
+
+class Header(Middleware):
+    """Middleware adding a header to each request."""
+
+    def prepare(self, request):
+        request.headers['X-Test'] = '1'
+        return 0
+
+
+class Attempts(Middleware):
+    """Middleware numbering attempts in prepare and recording the failed ones."""
+
+    def __init__(self):
+        self.count = 0
+        self.failures = []
+
+    def prepare(self, request):
+        self.count += 1
+        request.context['attempt'] = self.count
+        return 0
+
+    def failed(self, request, error, attempt):
+        self.failures.append((request.context.get('attempt'), request.headers.get('auth'), request.sent is not None))
+        return None
+
+
+CLANS = [{'tag': '2CCCP', 'name': 'Reddit Alpha'}]
+UNAVAILABLE = error_response(503, 'Unavailable')
+
+
+def test_get_clan_unwraps_list():
+    client = Client(token='x', transport=Transport([json_response(CLANS)]))
+    assert client.get_clan('#2cccp').name == 'Reddit Alpha'
+
+
+@pytest.mark.asyncio
+async def test_async_get_clan_unwraps_list():
+    client = AsyncClient(token='x', transport=AsyncTransport([json_response(CLANS)]))
+    assert (await client.get_clan('#2cccp')).name == 'Reddit Alpha'
+
+
+def test_middleware():
+    transport = Transport([json_response(CLANS[0], headers={'ETag': '"a"'}), json_response(None, 304)])
+    metrics = MetricsMiddleware()
+    client = Client(token='x', transport=transport, validators=MemoryCache(), middleware=[Header(), metrics])
+    first = client.get_clan('2CCCP')
+    assert client.get_clan('2CCCP') == first
+    assert client.revalidated_count == 1
+    assert transport.requests[0].headers == {'auth': 'x', 'X-Test': '1'}
+    assert transport.requests[1].headers['If-None-Match'] == '"a"'
+    stats = metrics.stats()
+    assert stats['requests'] == 2
+    assert stats['statuses'] == {200: 1, 304: 1}
+
+
+@pytest.mark.asyncio
+async def test_async_middleware():
+    transport = AsyncTransport([json_response(CLANS[0], headers={'ETag': '"a"'}), json_response(None, 304)])
+    metrics = MetricsMiddleware()
+    client = AsyncClient(token='x', transport=transport, validators=MemoryCache(), middleware=[Header(), metrics])
+    first = await client.get_clan('2CCCP')
+    assert await client.get_clan('2CCCP') == first
+    assert client.revalidated_count == 1
+    assert transport.requests[0].headers == {'auth': 'x', 'X-Test': '1'}
+    assert metrics.stats()['statuses'] == {200: 1, 304: 1}
+
+
+def test_error_response():
+    transport = Transport([error_response(429, 'Slow down', {'Retry-After': '2'})])
+    metrics = MetricsMiddleware()
+    client = Client(token='x', transport=transport, retry=RetryPolicy(max_attempts=1), middleware=[metrics])
+    with pytest.raises(APIClientResponseError) as e:
+        client.get_player('8L9L9GL')
+    assert e.value.status == 429
+    assert e.value.retry_after == 2.0
+    assert metrics.stats()['errors'] == {'APIClientResponseError': 1}
+
+
+def test_failed_gets_attempt_request():
+    attempts = Attempts()
+    transport = Transport([UNAVAILABLE, UNAVAILABLE, json_response(CLANS)])
+    client = Client(token='x', transport=transport, retry=RetryPolicy(backoff=0), middleware=[attempts])
+    assert client.get_clan('2CCCP').name == 'Reddit Alpha'
+    assert attempts.failures == [(1, 'x', True), (2, 'x', True)]
+
+
+@pytest.mark.asyncio
+async def test_async_failed_gets_attempt_request():
+    attempts = Attempts()
+    transport = AsyncTransport([UNAVAILABLE, json_response(CLANS)])
+    client = AsyncClient(token='x', transport=transport, retry=RetryPolicy(backoff=0), middleware=[attempts])
+    assert (await client.get_clan('2CCCP')).name == 'Reddit Alpha'
+    assert attempts.failures == [(1, 'x', True)]
@@ -15,9 +15,9 @@ def assert_player_model(player):
 
 @pytest.mark.asyncio
 async def test_profile_async():
-    client = AsyncClient()
-    player = await client.get_player('C0G20PR2')
-    assert_player_model(player)
+    async with AsyncClient() as client:
+        player = await client.get_player('C0G20PR2')
+        assert_player_model(player)
 
 
 def test_profile():
@@ -28,15 +28,15 @@ def test_profile():
 
 @pytest.mark.asyncio
 async def test_profile_equal():
-    client = AsyncClient()
-    player1 = await client.get_player('C0G20PR2')
-    player2 = await client.get_player('C0G20PR2')
-    assert player1 == player2
+    async with AsyncClient() as client:
+        player1 = await client.get_player('C0G20PR2')
+        player2 = await client.get_player('C0G20PR2')
+        assert player1 == player2
 
 
 @pytest.mark.asyncio
 async def test_profile_not_equal():
-    client = AsyncClient()
-    player1 = await client.get_player('C0G20PR2')
-    player2 = await client.get_player('PY9VC98C')
-    assert player1 != player2
+    async with AsyncClient() as client:
+        player1 = await client.get_player('C0G20PR2')
+        player2 = await client.get_player('PY9VC98C')
+        assert player1 != player2
@@ -16,9 +16,9 @@ def assert_popular_clans(popular_clans):
 @pytest.mark.asyncio
 async def test_popular_clans_async():
     """Test popular clans."""
-    client = AsyncClient()
-    popular_clans = await client.get_popular_clans()
-    assert_popular_clans(popular_clans)
+    async with AsyncClient() as client:
+        popular_clans = await client.get_popular_clans()
+        assert_popular_clans(popular_clans)
 
 
 def test_popular_clans():
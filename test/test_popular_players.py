@@ -16,9 +16,9 @@ def assert_popular_players(popular_players):
 @pytest.mark.asyncio
 async def test_popular_players_async():
     """Test popular players."""
-    client = AsyncClient()
-    popular_players = await client.get_popular_players()
-    assert_popular_players(popular_players)
+    async with AsyncClient() as client:
+        popular_players = await client.get_popular_players()
+        assert_popular_players(popular_players)
 
 
 def test_popular_players():
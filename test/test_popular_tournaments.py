@@ -16,9 +16,9 @@ def assert_popular_tournaments(tournaments):
 @pytest.mark.asyncio
 async def test_popular_tournaments_async():
     """Test popular tournaments."""
-    client = AsyncClient()
-    popular_tournaments = await client.get_popular_tournaments()
-    assert_popular_tournaments(popular_tournaments)
+    async with AsyncClient() as client:
+        popular_tournaments = await client.get_popular_tournaments()
+        assert_popular_tournaments(popular_tournaments)
 
 
 def test_popular_tournaments():
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from crapipy import RateLimiter
+
+
+def test_burst_is_free():
+    limiter = RateLimiter(rate=1, burst=3)
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve() == pytest.approx(1, abs=0.05)
+    assert limiter.reserve() == pytest.approx(2, abs=0.05)
+
+
+def test_acquire_waits():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_acquire_async_waits():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        await limiter.acquire_async()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retry_after_header():
+    limiter = RateLimiter(rate=100)
+    limiter.update_from_headers({'Retry-After': '2'})
+    assert limiter.reserve() == pytest.approx(2, abs=0.05)
+
+
+def test_remaining_header():
+    limiter = RateLimiter(rate=10, burst=10)
+    limiter.update_from_headers({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '3'})
+    assert limiter.reserve() == pytest.approx(3, abs=0.05)
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
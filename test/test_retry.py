@@ -0,0 +1,79 @@
+import pytest
+
+from crapipy import (APIClientResponseError, APIConnectionError, APIError, APITimeoutError, AsyncClient, Client,
+                     RetryPolicy)
+
+from . import AsyncTransport, Transport, error_response, json_response
+
+
+def test_should_retry():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(APITimeoutError(), 1)
+    assert policy.should_retry(APIConnectionError(), 2)
+    assert policy.should_retry(APIClientResponseError(status=503), 1)
+    assert not policy.should_retry(APIClientResponseError(status=503), 3)
+    assert not policy.should_retry(APIClientResponseError(status=404), 1)
+    assert not policy.should_retry(APIError(), 1)
+
+
+def test_delay():
+    policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+    assert [policy.delay(n) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+    assert policy.delay(1, retry_after=3) == 3
+    # Retry-After is not capped by max_backoff, too long a wait gives up.
+    assert policy.delay(1, retry_after=60) == 60
+    assert policy.delay(1, retry_after=301) is None
+    assert RetryPolicy(max_retry_after=None).delay(1, retry_after=3600) == 3600
+
+    policy = RetryPolicy(backoff=1, jitter=True)
+    assert all(0 <= policy.delay(3) <= 4 for _ in range(20))
+
+
+OK = json_response({'url': 'http://a'})
+TOO_MANY_REQUESTS = error_response(429, headers={'Retry-After': '0'})
+
+
+def test_client_retries():
+    transport = Transport([APITimeoutError(), TOO_MANY_REQUESTS, OK])
+    client = Client(transport=transport, retry=RetryPolicy(backoff=0.001))
+    assert client.fetch('http://a') == {'url': 'http://a'}
+    assert len(transport.requests) == 3
+
+
+def test_client_gives_up():
+    transport = Transport([APIConnectionError()] * 3 + [OK])
+    client = Client(transport=transport, retry=RetryPolicy(max_attempts=2, backoff=0.001))
+    with pytest.raises(APIConnectionError):
+        client.fetch('http://a')
+    assert len(transport.requests) == 2
+
+
+def test_client_no_retry():
+    client = Client(transport=Transport([APITimeoutError(), OK]), retry=None)
+    with pytest.raises(APITimeoutError):
+        client.fetch('http://a')
+
+
+def test_client_gives_up_on_long_retry_after():
+    transport = Transport([error_response(429, headers={'Retry-After': '600'}), OK])
+    client = Client(transport=transport, retry=RetryPolicy(backoff=0.001))
+    with pytest.raises(APIClientResponseError):
+        client.fetch('http://a')
+    assert len(transport.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries():
+    transport = AsyncTransport([error_response(502), APITimeoutError(), OK])
+    client = AsyncClient(transport=transport, retry=RetryPolicy(backoff=0.001))
+    assert await client.fetch('http://a') == {'url': 'http://a'}
+    assert len(transport.requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_client_does_not_retry_client_errors():
+    transport = AsyncTransport([error_response(404), OK])
+    client = AsyncClient(transport=transport, retry=RetryPolicy(backoff=0.001))
+    with pytest.raises(APIClientResponseError):
+        await client.fetch('http://a')
+    assert len(transport.requests) == 1
@@ -0,0 +1,93 @@
+import pytest
+
+from crapipy import schedule
+from crapipy.schedule import AdaptiveScheduler, Scheduler
+from crapipy.watch import Watcher
+
+from .test_watch import clan_client
+
+
+def test_scheduler_deadline_order():
+    scheduler = Scheduler(interval=0)
+    for key in ('a', 'b', 'c'):
+        scheduler.add(key)
+    assert scheduler.pop_due(limit=2) == ['a', 'b']
+    assert scheduler.pop_due() == ['c']
+    assert scheduler.pop_due() == []
+    scheduler.done('b')
+    scheduler.done('a')
+    assert scheduler.pop_due() == ['b', 'a']
+
+
+def test_scheduler_interval():
+    scheduler = Scheduler(interval=60)
+    scheduler.add('a')
+    scheduler.add('b', interval=0)
+    assert scheduler.pop_due() == ['a', 'b']
+    scheduler.done('a')
+    scheduler.done('b')
+    assert scheduler.pop_due() == ['b']
+    assert 59 < scheduler.next_deadline() <= 60
+    scheduler.remove('a')
+    assert scheduler.next_deadline() is None
+    assert len(scheduler) == 1
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(schedule.time, 'monotonic', clock)
+    return clock
+
+
+def test_adaptive_scheduler(clock):
+    scheduler = AdaptiveScheduler(min_interval=10, max_interval=80, interval=20)
+    scheduler.add('busy')
+    scheduler.add('idle')
+    scheduler.add('fixed', interval=1000)
+    assert scheduler.intervals['fixed'] == 80
+    for _ in range(100):
+        for key in scheduler.pop_due():
+            scheduler.done(key, changed=key == 'busy')
+        clock.now += 5
+    assert scheduler.intervals['busy'] == 10
+    assert scheduler.intervals['idle'] == 80
+    # The interval follows the smoothed rate of changes per second.
+    assert scheduler.change_rates['busy'] > scheduler.change_rates['idle'] > 0
+
+
+def test_requeue(clock):
+    scheduler = AdaptiveScheduler(min_interval=10, max_interval=80, interval=20)
+    scheduler.add('a')
+    assert scheduler.pop_due() == ['a']
+    scheduler.requeue('a', delay=0)
+    assert scheduler.pop_due() == ['a']
+    scheduler.requeue('a')
+    assert scheduler.next_deadline() == 20
+    # A requeued poll is not an observation of the key.
+    assert scheduler.intervals['a'] == 20
+
+
+def test_adaptive_scheduler_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveScheduler(min_interval=10, max_interval=5)
+
+
+def test_watcher_adaptive(clock):
+    watcher = Watcher(clan_client(), scheduler=AdaptiveScheduler(min_interval=0, max_interval=10, interval=1))
+    watcher.watch_clan('2CCCP')
+    watcher.poll()
+    assert watcher.scheduler.intervals[('clan', '2CCCP')] == 1
+    clock.now += 1
+    assert len(watcher.poll()) == 1
+    assert watcher.scheduler.intervals[('clan', '2CCCP')] < 1
@@ -0,0 +1,82 @@
+"""
+Test the sessions kept by the clients.
+"""
+import asyncio
+
+import aiohttp
+import pytest
+import requests
+
+from crapipy import AsyncClient, Client
+
+
+def test_session_reused():
+    closed = []
+    with Client() as client:
+        session = client.session
+        assert client.session is session
+        session.close = lambda: closed.append(True)
+    assert closed == [True]
+
+
+def test_close():
+    client = Client()
+    session = client.session
+    closed = []
+    session.close = lambda: closed.append(True)
+    client.close()
+    assert closed == [True]
+    # A closed client opens a new session when it is used again.
+    assert client.session is not session
+    client.close()
+
+
+def test_session_not_closed():
+    session = requests.Session()
+    closed = []
+    session.close = lambda: closed.append(True)
+    with Client(session=session) as client:
+        assert client.session is session
+    assert closed == []
+
+
+@pytest.mark.asyncio
+async def test_async_session_reused():
+    async with AsyncClient() as client:
+        session = client.session
+        assert client.session is session
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_async_close():
+    client = AsyncClient()
+    session = client.session
+    await client.close()
+    assert session.closed
+    # A closed client opens a new session when it is used again.
+    assert not client.session.closed
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_async_session_not_closed():
+    session = aiohttp.ClientSession()
+    async with AsyncClient(session=session) as client:
+        assert client.session is session
+    assert not session.closed
+    await session.close()
+
+
+def test_async_session_per_loop():
+    client = AsyncClient()
+
+    async def get_session():
+        return await client.transport._get_session()
+
+    first = asyncio.run(get_session())
+    second = asyncio.run(get_session())
+    assert second is not first
+    assert first.closed
+    asyncio.run(client.close())
+    assert second.closed
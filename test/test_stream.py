@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from crapipy import APIError, AsyncClient, Client
+from crapipy.pipeline import Response
+from crapipy.stream import JSONArrayParser
+
+from . import AsyncTransport, Transport, load_body
+
+
+def parse(body, chunk_size):
+    parser = JSONArrayParser()
+    items = []
+    for i in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[i:i + chunk_size]))
+    items.extend(parser.close())
+    return items
+
+
+def test_parser():
+    body = load_body('top_players.json')
+    for chunk_size in (1, 7, 1000, len(body)):
+        assert parse(body, chunk_size) == json.loads(body.decode())
+
+
+def test_parser_strings_and_scalars():
+    data = [1, 'a\\"],[', {'x': '}\\\\'}, None, [[], {}], True, 2.5]
+    assert parse(json.dumps(data).encode(), 1) == data
+    assert parse(b' [ ] ', 1) == []
+
+
+def test_parser_object():
+    body = load_body('player_8L9L9GL.json')
+    assert parse(body, 100) == [json.loads(body.decode())]
+
+
+def test_parser_truncated():
+    parser = JSONArrayParser()
+    parser.feed(b'[1, 2')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+class RawResponse:
+    """Unread streamed response answering locally."""
+
+    status_code = status = 200
+
+    def __init__(self, body, chunk_size):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.content = self
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    async def read(self, chunk_size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+    def close(self):
+        self.closed = True
+
+    release = close
+
+
+def stream_client(client_class, body, **kwargs):
+    """Return client answering stream requests with body, and the response it streams."""
+    raw = RawResponse(body, 100)
+    transport = (AsyncTransport if client_class is AsyncClient else Transport)(
+        lambda request: Response(200, {}, None, raw=raw)
+    )
+    return client_class(transport=transport, **kwargs), raw
+
+
+def test_stream_players():
+    client, raw = stream_client(Client, load_body('player_L88P2282,9CQ2U8QJ,8L9L9GL.json'))
+    players = list(client.stream_players(['L88P2282', '9CQ2U8QJ', '8L9L9GL']))
+    assert [p.tag for p in players] == ['L88P2282', '9CQ2U8QJ', '8L9L9GL']
+    assert players[0].arena.arena_id > 0
+    assert raw.closed
+
+
+def test_stream_error():
+    client, raw = stream_client(Client, b'{"error": true, "status": 404, "message": "Not found"}')
+    with pytest.raises(APIError):
+        list(client.stream_players(['2CCCP']))
+
+
+@pytest.mark.asyncio
+async def test_async_stream_clans():
+    client, raw = stream_client(AsyncClient, load_body('clan_2CCCP,2U2GGQJ.json'), model_type='lazy')
+    tags = []
+    async for clan in client.stream_clans(['2CCCP', '2U2GGQJ']):
+        tags.append(clan.tag)
+    assert tags == ['2CCCP', '2U2GGQJ']
+    assert raw.closed
+
+
+@pytest.mark.asyncio
+async def test_async_stream_close():
+    client, raw = stream_client(AsyncClient, load_body('clan_2CCCP,2U2GGQJ.json'))
+    async with client.stream_clans(['2CCCP', '2U2GGQJ']) as clans:
+        async for clan in clans:
+            break
+    assert raw.closed
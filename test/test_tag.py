@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+from crapipy import Tag
+
+
+def test_tag():
+    tag = Tag('#2cCOp')
+    assert tag.tag == '2CC0P'
+    assert tag.valid
+    assert tag.invalid_chars == []
+    tag = Tag('#ABC2')
+    assert not tag.valid
+    assert tag.invalid_chars == ['A', 'B']
+
+
+def test_normalize_many():
+    tags = ['#2cCOp', '8L9L9GL', '#ab']
+    assert Tag.normalize_many(tags) == [Tag(tag).tag for tag in tags]
+
+
+def test_validate_many():
+    valid, invalid = Tag.validate_many(['#2cccp', 'abc', '8l9l9gl', '#X'])
+    assert valid == ['2CCCP', '8L9L9GL']
+    assert invalid == ['ABC', 'X']
+
+
+def test_encode_decode():
+    assert Tag.encode('') == 0
+    assert Tag.encode('0') == 1
+    assert Tag.encode('00') == 15
+    assert Tag.encode('#8l9l9gl') == Tag('8L9L9GL').id
+    assert Tag.from_id(Tag.encode('8L9L9GL')).tag == '8L9L9GL'
+    assert Tag.encode('V' * 16) < 2 ** 63
+
+    # Every tag gets the next ID
+    tag_ids = []
+    for length in range(4):
+        for chars in itertools.product(Tag.TAG_CHARACTERS, repeat=length):
+            tag = ''.join(chars)
+            tag_ids.append(Tag.encode(tag))
+            assert Tag.decode(tag_ids[-1]) == tag
+    assert tag_ids == list(range(len(tag_ids)))
+
+
+def test_encode_invalid():
+    with pytest.raises(ValueError):
+        Tag.encode('ABC')
+    with pytest.raises(ValueError):
+        Tag.decode(-1)
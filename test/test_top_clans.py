@@ -13,9 +13,9 @@ def assert_top_clans(top_clans, location=''):
 @pytest.mark.asyncio
 async def test_top_clans_async():
     """Test top clans."""
-    client = AsyncClient()
-    top_clans = await client.get_top_clans()
-    assert_top_clans(top_clans)
+    async with AsyncClient() as client:
+        top_clans = await client.get_top_clans()
+        assert_top_clans(top_clans)
 
 
 def test_top_clans():
@@ -28,10 +28,10 @@ def test_top_clans():
 @pytest.mark.asyncio
 async def test_top_local_clans_async():
     """Test top clans."""
-    client = AsyncClient()
-    locatiion = 'us'
-    top_clans = await client.get_top_clans(locatiion)
-    assert_top_clans(top_clans, locatiion)
+    async with AsyncClient() as client:
+        locatiion = 'us'
+        top_clans = await client.get_top_clans(locatiion)
+        assert_top_clans(top_clans, locatiion)
 
 
 def test_top_local_clans():
@@ -12,9 +12,9 @@ def assert_top_players(top_players, location=''):
 
 @pytest.mark.asyncio
 async def test_top_players_async():
-    client = AsyncClient()
-    top_players = await client.get_top_players()
-    assert_top_players(top_players)
+    async with AsyncClient() as client:
+        top_players = await client.get_top_players()
+        assert_top_players(top_players)
 
 
 def test_top_players():
@@ -25,10 +25,10 @@ def test_top_players():
 @pytest.mark.asyncio
 async def test_top_local_players_async():
     """Test top clans."""
-    client = AsyncClient()
-    locatiion = 'us'
-    top_players = await client.get_top_players(locatiion)
-    assert_top_players(top_players, locatiion)
+    async with AsyncClient() as client:
+        locatiion = 'us'
+        top_players = await client.get_top_players(locatiion)
+        assert_top_players(top_players, locatiion)
 
 
 def test_top_local_players():
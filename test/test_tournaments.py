@@ -18,9 +18,9 @@ def assert_tournament_model(tournament):
 
 @pytest.mark.asyncio
 async def test_tournament_async():
-    client = AsyncClient()
-    player = await client.get_tournament('20LLGRLC')
-    assert_tournament_model(player)
+    async with AsyncClient() as client:
+        player = await client.get_tournament('20LLGRLC')
+        assert_tournament_model(player)
 
 
 def test_tournament():
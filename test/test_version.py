@@ -9,9 +9,9 @@ def assert_version(version):
 
 @pytest.mark.asyncio
 async def test_version_async():
-    client = AsyncClient()
-    version = await client.get_version()
-    assert_version(version)
+    async with AsyncClient() as client:
+        version = await client.get_version()
+        assert_version(version)
 
 
 def test_version():
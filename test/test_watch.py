@@ -0,0 +1,129 @@
+import asyncio
+import copy
+
+import pytest
+
+from crapipy import AsyncClient, Client, MemoryCache
+from crapipy.watch import ADDED, CHANGED, REMOVED, Change, Watcher, diff
+
+from . import AsyncTransport, Transport, json_response, load_data, url_tags
+
+
+def test_diff():
+    old = load_data('clan_2CCCP.json')
+    new = copy.deepcopy(old)
+    assert list(diff(old, new)) == []
+    new['score'] += 10
+    new['members'][0]['donations'] = 100
+    left = new['members'].pop(1)
+    new['members'].append(dict(tag='2PP', name='New'))
+    changes = list(diff(old, new))
+    tag = old['members'][0]['tag']
+    assert (CHANGED, ('score',), old['score'], old['score'] + 10) in changes
+    assert (CHANGED, ('members', tag, 'donations'), 0, 100) in changes
+    assert (REMOVED, ('members',), left, None) in changes
+    assert (ADDED, ('members',), None, dict(tag='2PP', name='New')) in changes
+    assert len(changes) == 4
+    assert list(diff(old, new, ignore={'members'})) == [(CHANGED, ('score',), old['score'], old['score'] + 10)]
+
+
+def clan_client(client_class=Client, fail_on=None, **kwargs):
+    """Return client answering clans locally with a score going up on each request.
+
+    :param fail_on: Number of the request raising RuntimeError.
+    """
+    def clans(request):
+        count = len(transport.requests)
+        if count == fail_on:
+            raise RuntimeError("request failed")
+        return json_response([dict(tag=tag, score=count) for tag in url_tags(request.url)])
+
+    transport = (AsyncTransport if client_class is AsyncClient else Transport)(clans)
+    return client_class(transport=transport, **kwargs)
+
+
+def test_watcher_poll():
+    client = clan_client()
+    watcher = Watcher(client, interval=0)
+    watcher.watch_clan('#2cccp')
+    watcher.watch_clan('2U2GGQJ')
+    assert watcher.poll() == []
+    assert len(client.transport.requests) == 1
+    changes = watcher.poll()
+    assert len(client.transport.requests) == 2
+    assert sorted(c.tag for c in changes) == ['2CCCP', '2U2GGQJ']
+    assert changes[0] == Change('clan', changes[0].tag, CHANGED, ('score',), 1, 2)
+
+
+def test_watcher_skips_cache():
+    client = clan_client(cache=MemoryCache())
+    watcher = Watcher(client, interval=0)
+    watcher.watch_clan('2CCCP')
+    watcher.poll()
+    assert len(watcher.poll()) == 1
+    assert len(client.transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_watcher_skips_cache():
+    client = clan_client(AsyncClient, cache=MemoryCache())
+    watcher = Watcher(client, interval=0)
+    watcher.watch_clan('2CCCP')
+    await watcher.poll_async()
+    assert len(await watcher.poll_async()) == 1
+    assert len(client.transport.requests) == 2
+
+
+def test_watcher_interval():
+    client = clan_client()
+    watcher = Watcher(client, interval=0)
+    watcher.watch_clan('2CCCP')
+    watcher.watch_clan('2U2GGQJ', interval=3600)
+    watcher.poll()
+    watcher.poll()
+    assert [c.tag for c in watcher.poll()] == ['2CCCP']
+    assert 0 <= watcher.next_poll() <= 1
+    watcher.unwatch('clan', '2CCCP')
+    assert watcher.next_poll() > 3000
+    assert len(watcher) == 1
+
+
+def test_watcher_error():
+    client = clan_client(fail_on=1)
+    watcher = Watcher(client, interval=0, batch_size=1)
+    watcher.watch_clan('2CCCP')
+    watcher.watch_clan('2U2GGQJ')
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+    # Both tags stay scheduled, including the one which was not fetched.
+    watcher.poll()
+    assert len(client.transport.requests) == 3
+    assert len(watcher.snapshots) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_watcher_cancelled():
+    client = clan_client(AsyncClient)
+    watcher = Watcher(client, interval=60)
+    watcher.watch_clan('2CCCP')
+    client.transport.delay = 10
+    poll = asyncio.ensure_future(watcher.poll_async())
+    await asyncio.sleep(0.01)
+    poll.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await poll
+    assert watcher.next_poll() is not None
+
+
+@pytest.mark.asyncio
+async def test_async_watcher():
+    client = clan_client(AsyncClient)
+    watcher = Watcher(client, interval=0)
+    watcher.watch_player('8L9L9GL')
+    assert await watcher.poll_async() == []
+    changes = []
+    async for change in watcher:
+        changes.append(change)
+        if len(changes) == 2:
+            break
+    assert [c.new for c in changes] == [2, 3]